@@ -0,0 +1,370 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation, localcontext
+from typing import Dict, List, Optional, Set
+
+from util.formula import FormulaTemplate, column_number
+
+# templateシートのSTART_ROW_IDX行目の数式(シングルクオートを除いたもの)
+# この数式と同じ列だけをPythonで計算する、数式を変えた列はそのまま数式で出力される
+TEMPLATE_FORMULAS = {
+    "Q": "=ROUND(IF(ISBLANK(M{3}), P{3}, M{3}) * N{3}, 2)",
+    "U": '=IF(ISBLANK(T{3}), "", _xlfn.INDIRECT(ADDRESS(ROW(),MATCH(T{3}&"(ave)",$A$1:$GZ$1,0))))',
+    "V": "=ROUND(S{3}*U{3}, 2)",
+    "Y": '=IF(OR(H{3}="ボーナス", H{3}="売却", H{3}="物品売却", H{3}="報酬"), ABS(IF(NOT(ISBLANK(K{3})), K{3}, Q{3})), 0)',
+    "Z": '=_xlfn.IFNA(_xlfn.IFS(OR(H{3}="売却", H{3}="物品売却", AND(OR(H{3}="転送", H{3}="転入", H{3}="ボーナス", H{3}="報酬"), NOT(ISBLANK(L{3})))),  IF(NOT(ISBLANK(L{3})), L{3}, ABS(N{3})*_xlfn.INDIRECT(ADDRESS(ROW()-1,MATCH(O{3}&"(ave)",$A$1:$GZ$1,0))))), 0)',
+    "AA": "=V{3}",
+    "AB": "=Y{3}-Z{3}-AA{3}",
+    "AC": "=AB{3}*X{3}",
+}
+# シンボルごとの残高と平均単価の数式、シンボルの列にずらして使う
+TEMPLATE_AMOUNT_FORMULA = (
+    "AE",
+    '=ROUND({AE}{2} - IF($T{3}= SUBSTITUTE({AE}$1, "(amt)", ""),$S{3}, 0)+ IF(AND($O{3}= SUBSTITUTE({AE}$1, "(amt)", ""), ISBLANK($J{3})), $N{3}, 0), 9)',
+)
+TEMPLATE_AVERAGE_FORMULA = (
+    "AF",
+    '=_xlfn.IFNA(_xlfn.IFS({AE}{3}=0, 0, AND($J{3}="", OR($H{3}="実行", $H{3}="ボーナス", $H{3}="購入", $H{3}="転入", $H{3}="引き出し", $H{3}="報酬"), $O{3}=SUBSTITUTE({AF}$1, "(ave)", ""), $N{3}>0), ({AE}{2}*{AF}{2}+$Q{3})/({AE}{2}+$N{3})), {AF}{2})',
+)
+
+SELLING_PRICE_TRADES = ("ボーナス", "売却", "物品売却", "報酬")
+SELLING_COST_TRADES = ("売却", "物品売却")
+MANUAL_COST_TRADES = ("転送", "転入", "ボーナス", "報酬")
+AVERAGE_TRADES = ("実行", "ボーナス", "購入", "転入", "引き出し", "報酬")
+
+# 計算の有効桁数、uint256(78桁)の生の値のままの数量でも丸めずに計算できるようにする
+CALC_PRECISION = 80
+
+# MATCHで探す1行目の範囲($A$1:$GZ$1)
+MATCH_MAX_COL = column_number("GZ")
+
+# 数式で参照する列
+COL_H = column_number("H")
+COL_J = column_number("J")
+COL_K = column_number("K")
+COL_L = column_number("L")
+COL_M = column_number("M")
+COL_N = column_number("N")
+COL_O = column_number("O")
+COL_P = column_number("P")
+COL_Q = column_number("Q")
+COL_S = column_number("S")
+COL_T = column_number("T")
+COL_U = column_number("U")
+COL_V = column_number("V")
+COL_X = column_number("X")
+COL_Y = column_number("Y")
+COL_Z = column_number("Z")
+COL_AA = column_number("AA")
+COL_AB = column_number("AB")
+COL_AC = column_number("AC")
+
+
+class ExcelError(str):
+    """Excelのエラー値、openpyxlはこの文字列をエラーのセルとして書き出す"""
+
+
+VALUE_ERROR = ExcelError("#VALUE!")
+NA_ERROR = ExcelError("#N/A")
+DIV0_ERROR = ExcelError("#DIV/0!")
+
+
+class FormulaError(Exception):
+    def __init__(self, error: ExcelError):
+        super().__init__(error)
+        self.error = error
+
+
+def to_cell_value(value):
+    """データのセルの値を計算用にする、空文字は空のセル(None)として扱う"""
+    if value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return Decimal(str(value))
+    return value
+
+
+def to_number(value) -> Decimal:
+    """四則演算での値、空のセルは0、数値にできない文字列は#VALUE!"""
+    if isinstance(value, ExcelError):
+        raise FormulaError(value)
+    if value is None:
+        return Decimal(0)
+    if isinstance(value, Decimal):
+        return value
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise FormulaError(VALUE_ERROR)
+    if not number.is_finite():
+        raise FormulaError(VALUE_ERROR)
+    return number
+
+
+def to_result(value):
+    """他のセルを参照する数式の結果、空のセルは0になる"""
+    return Decimal(0) if value is None else value
+
+
+def is_text_equal(value, text: str) -> bool:
+    """セルの値と文字列の比較、Excelと同じく大文字小文字は区別しない"""
+    if isinstance(value, ExcelError):
+        raise FormulaError(value)
+    if value is None:
+        value = ""
+    if not isinstance(value, str):
+        return False
+    return value.upper() == text.upper()
+
+
+def is_greater_than_zero(value) -> bool:
+    """Excelでは文字列は数値より大きい"""
+    if isinstance(value, ExcelError):
+        raise FormulaError(value)
+    if isinstance(value, str):
+        return True
+    return to_number(value) > 0
+
+
+def round_half_up(value: Decimal, digits: int) -> Decimal:
+    """ExcelのROUND(0から遠い方に丸める)
+    quantizeは結果の桁数が有効桁数を超えるとInvalidOperationになるので足りない分を広げる
+    """
+    with localcontext() as context:
+        context.prec = max(context.prec, value.adjusted() + digits + 1)
+        return value.quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP)
+
+
+def evaluate(func, *args):
+    """数式を計算する、途中でエラーになった場合はエラー値を返す"""
+    try:
+        return func(*args)
+    except FormulaError as e:
+        return e.error
+
+
+def if_na(func, *args, default=None):
+    """IFNA、#N/Aの場合はdefaultの値を返す"""
+    value = evaluate(func, *args)
+    return default if value == NA_ERROR else value
+
+
+class HistoryCalculator:
+    """
+    templateシートの数式と同じ計算をDecimalで行い、数式の代わりに値を出力する
+    売却価額/売却原価/手数料/所得と、シンボルごとの残高(amt)と平均単価(ave)を
+    時刻順の行を上から順に計算する(前の行の残高と平均単価を引き継ぐ)
+    """
+
+    def __init__(
+        self,
+        header: List[Optional[str]],
+        initial_row: List,
+        formulas: Dict[int, str],
+        template_row_idx: int,
+    ):
+        """
+        :param header: 1行目(シンボルの列を含む)の値
+        :param initial_row: 2行目(初期残高)の値
+        :param formulas: 列番号ごとの数式のテンプレート(シンボルの列も含む)
+        :param template_row_idx: 数式のテンプレートの基準の行番号
+        """
+        self.columns: Set[int] = set()
+        self.amount_columns: Dict[int, str] = dict()
+        self.average_columns: Dict[int, str] = dict()
+
+        def is_template(col, template_value, base_col=None):
+            formula_template = FormulaTemplate(template_value, template_row_idx)
+            shift = 0 if base_col is None else col - column_number(base_col)
+            return formulas.get(col) == formula_template.render(column_shift=shift)
+
+        for letter, template_value in TEMPLATE_FORMULAS.items():
+            col = column_number(letter)
+            if is_template(col, template_value):
+                self.columns.add(col)
+        for col in formulas.keys():
+            if col > len(header) or not isinstance(header[col - 1], str):
+                continue
+            if is_template(col, TEMPLATE_AMOUNT_FORMULA[1], TEMPLATE_AMOUNT_FORMULA[0]):
+                self.amount_columns[col] = header[col - 1].replace("(amt)", "")
+            elif is_template(
+                col, TEMPLATE_AVERAGE_FORMULA[1], TEMPLATE_AVERAGE_FORMULA[0]
+            ):
+                self.average_columns[col] = header[col - 1].replace("(ave)", "")
+        # 平均単価は同じ行の残高と取得価額(Q)を使うので、それも計算する場合だけ計算する
+        self.average_columns = {
+            col: symbol
+            for col, symbol in self.average_columns.items()
+            if col - 1 in self.amount_columns and COL_Q in self.columns
+        }
+        self.columns.update(self.amount_columns.keys())
+        self.columns.update(self.average_columns.keys())
+
+        self.match_columns: Dict[str, int] = dict()
+        for col, value in enumerate(header[:MATCH_MAX_COL], start=1):
+            if isinstance(value, str):
+                self.match_columns.setdefault(value.upper(), col)
+
+        # 数式のまま出力する列を参照する列は、その列も数式のまま出力する
+        # U/Zは1行目が(ave)の列をMATCHで探すので、その列をすべて計算する場合だけ計算する
+        average_matched = all(
+            col in self.average_columns
+            for name, col in self.match_columns.items()
+            if name.endswith("(AVE)")
+        )
+        for col, depends in (
+            (COL_U, [] if average_matched else [None]),
+            (COL_V, [COL_U]),
+            (COL_Y, [COL_Q]),
+            (COL_Z, [] if average_matched else [None]),
+            (COL_AA, [COL_V]),
+            (COL_AB, [COL_Y, COL_Z, COL_AA]),
+            (COL_AC, [COL_AB]),
+        ):
+            if not all(depend in self.columns for depend in depends):
+                self.columns.discard(col)
+
+        self.previous = [to_cell_value(value) for value in initial_row]
+
+    def match(self, value) -> int:
+        """MATCH(value&"(ave)",$A$1:$GZ$1,0)"""
+        if isinstance(value, ExcelError):
+            raise FormulaError(value)
+        text = "" if value is None else str(value)
+        col = self.match_columns.get((text + "(ave)").upper())
+        if col is None:
+            raise FormulaError(NA_ERROR)
+        return col
+
+    def calc(self, values: List) -> List:
+        """
+        1行分の数式の列を計算してvaluesに書き込む、行は時刻順に渡す
+        :param values: データ行の値、数式の列まで長さを伸ばしたもの
+        """
+        with localcontext() as context:
+            context.prec = CALC_PRECISION
+            return self._calc(values)
+
+    def _calc(self, values: List) -> List:
+        row = [to_cell_value(value) for value in values]
+        previous = self.previous
+        previous.extend([None] * (len(row) - len(previous)))
+
+        def get(col):
+            return row[col - 1]
+
+        def set_value(col, value):
+            row[col - 1] = value
+            values[col - 1] = value
+
+        if COL_Q in self.columns:
+            set_value(COL_Q, evaluate(self.calc_fiat_quantity, get))
+        for col, symbol in self.amount_columns.items():
+            set_value(col, evaluate(self.calc_amount, get, previous, col, symbol))
+            average_col = col + 1
+            if average_col in self.average_columns:
+                set_value(
+                    average_col,
+                    if_na(
+                        self.calc_average,
+                        get,
+                        previous,
+                        col,
+                        self.average_columns[average_col],
+                        default=to_result(previous[average_col - 1]),
+                    ),
+                )
+        if COL_U in self.columns:
+            set_value(COL_U, evaluate(self.calc_fee_currency_rate, get))
+        if COL_V in self.columns:
+            set_value(
+                COL_V,
+                evaluate(
+                    lambda: round_half_up(
+                        to_number(get(COL_S)) * to_number(get(COL_U)), 2
+                    )
+                ),
+            )
+        if COL_Y in self.columns:
+            set_value(COL_Y, evaluate(self.calc_selling_price, get))
+        if COL_Z in self.columns:
+            set_value(
+                COL_Z, if_na(self.calc_selling_cost, get, previous, default=Decimal(0))
+            )
+        if COL_AA in self.columns:
+            set_value(COL_AA, to_result(get(COL_V)))
+        if COL_AB in self.columns:
+            set_value(
+                COL_AB,
+                evaluate(
+                    lambda: to_number(get(COL_Y))
+                    - to_number(get(COL_Z))
+                    - to_number(get(COL_AA))
+                ),
+            )
+        if COL_AC in self.columns:
+            set_value(
+                COL_AC, evaluate(lambda: to_number(get(COL_AB)) * to_number(get(COL_X)))
+            )
+
+        self.previous = row
+        return values
+
+    @staticmethod
+    def calc_fiat_quantity(get):
+        rate = get(COL_P) if get(COL_M) is None else get(COL_M)
+        return round_half_up(to_number(rate) * to_number(get(COL_N)), 2)
+
+    @staticmethod
+    def calc_amount(get, previous, col, symbol):
+        amount = to_number(previous[col - 1])
+        if is_text_equal(get(COL_T), symbol):
+            amount -= to_number(get(COL_S))
+        if is_text_equal(get(COL_O), symbol) and get(COL_J) is None:
+            amount += to_number(get(COL_N))
+        return round_half_up(amount, 9)
+
+    @staticmethod
+    def calc_average(get, previous, amount_col, symbol):
+        amount = get(amount_col)
+        if isinstance(amount, ExcelError):
+            raise FormulaError(amount)
+        if to_number(amount) == 0:
+            return Decimal(0)
+        if (
+            is_text_equal(get(COL_J), "")
+            and any(is_text_equal(get(COL_H), trade) for trade in AVERAGE_TRADES)
+            and is_text_equal(get(COL_O), symbol)
+            and is_greater_than_zero(get(COL_N))
+        ):
+            previous_amount = to_number(previous[amount_col - 1])
+            previous_average = to_number(previous[amount_col])
+            divisor = previous_amount + to_number(get(COL_N))
+            dividend = previous_amount * previous_average + to_number(get(COL_Q))
+            if divisor == 0:
+                raise FormulaError(DIV0_ERROR)
+            return dividend / divisor
+        raise FormulaError(NA_ERROR)
+
+    def calc_fee_currency_rate(self, get):
+        if get(COL_T) is None:
+            return ""
+        return to_result(get(self.match(get(COL_T))))
+
+    @staticmethod
+    def calc_selling_price(get):
+        if not any(is_text_equal(get(COL_H), trade) for trade in SELLING_PRICE_TRADES):
+            return Decimal(0)
+        return abs(to_number(get(COL_Q) if get(COL_K) is None else get(COL_K)))
+
+    def calc_selling_cost(self, get, previous):
+        if not (
+            any(is_text_equal(get(COL_H), trade) for trade in SELLING_COST_TRADES)
+            or (
+                any(is_text_equal(get(COL_H), trade) for trade in MANUAL_COST_TRADES)
+                and get(COL_L) is not None
+            )
+        ):
+            raise FormulaError(NA_ERROR)
+        if get(COL_L) is not None:
+            return get(COL_L)
+        average = previous[self.match(get(COL_O)) - 1]
+        return abs(to_number(get(COL_N))) * to_number(average)
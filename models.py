@@ -1,16 +1,24 @@
 import abc
 import copy
-from datetime import datetime, timedelta
+import functools
+import hashlib
+import os
+import pickle
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from decimal import Decimal
 from enum import Enum
 from itertools import islice
-from sys import stdout
-from typing import List, Set, TypedDict, TypeGuard
+from sys import intern, stdout
+from typing import Dict, List, Optional, Set, Tuple, TypedDict, TypeGuard
 from zoneinfo import ZoneInfo
 
+import numpy as np
 import pandas as pd
 
-from util.util import get_rate, to_decimal
+from util.util import NOT_AVAILABLE, RateIndex, get_rate, to_decimal
 from wopenpyxl import WOpenpyxl
 
 JST = ZoneInfo("Asia/Tokyo")
@@ -49,8 +57,13 @@ NETWORKS: List[Network] = [
 BASE_SYMBOLS = ["OAS"]
 
 
-def load_rate_df():
-    book = WOpenpyxl("./data/rate.xlsx", data_only=True)
+RATE_PATH = "./data/rate.xlsx"
+# パース済みのレートの保存先、dataの下はアドレスとして扱われるので分ける
+RATE_CACHE_PATH = "./cache/rate.pickle"
+
+
+def load_rate_df(path: str = RATE_PATH):
+    book = WOpenpyxl(path, data_only=True)
     data = book.active_sheet.values
     cols = next(data)[1:]
     data = list(data)
@@ -59,7 +72,165 @@ def load_rate_df():
     return df
 
 
-rate_df = load_rate_df()
+def load_rate_index(
+    path: str = RATE_PATH, cache_path: Optional[str] = RATE_CACHE_PATH
+) -> RateIndex:
+    """rate.xlsxを読み込んでRateIndexを作る
+    結果はxlsxの更新日時とハッシュと一緒にcache_pathに保存し、
+    どちらも変わっていなければ次回からはxlsxをパースせずにそちらを使う
+    """
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    mtime = os.path.getmtime(path)
+
+    if cache_path is not None and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                cache = pickle.load(f)
+            if cache["mtime"] == mtime and cache["sha256"] == digest:
+                return cache["rate_index"]
+        except Exception as e:
+            print("rate cache is broken: {}".format(e))
+
+    rate_index = RateIndex.from_df(load_rate_df(path))
+    if cache_path is not None:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        temp_path = cache_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump({"mtime": mtime, "sha256": digest, "rate_index": rate_index}, f)
+        os.replace(temp_path, cache_path)
+    return rate_index
+
+
+@functools.cache
+def get_rate_index() -> RateIndex:
+    """初回に使う時にレートを読み込む"""
+    return load_rate_index()
+
+
+SECONDS_PER_DAY = 24 * 60 * 60
+DATE_TIME_FORMAT = "%Y/%m/%d %H:%M:%S"
+TRADING_DATE_FORMAT = "%Y/%m/%d"
+
+_deferred_pricing: ContextVar[bool] = ContextVar("deferred_pricing", default=False)
+
+
+@functools.lru_cache(maxsize=None)
+def format_trading_date(day: int) -> str:
+    """unix時間の日数から取引日(YYYY/MM/DD)を返す
+    JSTの朝08:59:59までを前日と見なすので、取引日はUTCの日付と同じになる
+    """
+    return datetime.fromtimestamp(day * SECONDS_PER_DAY, tz=timezone.utc).strftime(
+        TRADING_DATE_FORMAT
+    )
+
+
+@contextmanager
+def deferred_pricing():
+    """この中で作ったレコードはcalcでレートを引かない
+    作り終わったらprice_recordsでまとめてunit_priceを設定する
+    """
+    token = _deferred_pricing.set(True)
+    try:
+        yield
+    finally:
+        _deferred_pricing.reset(token)
+
+
+def price_records(records: List["AbstractRecord"]):
+    """レコードのunit_priceとfiat_quantityをまとめて設定する
+    取引日(JST 08:59:59までは前日)はunix_timestampのUTCの日付と同じなので、
+    86400で割った日数とシンボルでレート表と1回で結合する
+    """
+    targets = [record for record in records if record.get_rate_symbol() is not None]
+    if len(targets) == 0:
+        return
+
+    frame = pd.DataFrame(
+        {
+            "day": np.array([record.timestamp for record in targets], dtype=np.int64)
+            // SECONDS_PER_DAY,
+            "symbol": [record.get_rate_symbol().lower() for record in targets],
+        }
+    )
+    merged = frame.merge(get_rate_index().to_frame(), on=["day", "symbol"], how="left")
+    for record, rate in zip(targets, merged["rate"].tolist()):
+        record.unit_price = rate if isinstance(rate, (Decimal, str)) else NOT_AVAILABLE
+        record.fiat_quantity = record.get_fiat_quantity()
+
+
+# (項目名, 列名の正規表現, 列がある条件)
+# 条件がPRIVATE_TAG/BLOCKNOの列はヘッダーにその列がある場合だけ並んでいる
+Column = Tuple[str, str, Optional[str]]
+PRIVATE_TAG = "private_tag"
+BLOCKNO = "blockno"
+
+
+class ColumnMap:
+    """CSVのヘッダーから項目名→列位置の対応を作る
+    列名で全ての項目が見つかった場合は列名の位置を使うので列の並び替えにも対応する
+    見つからない場合は従来通りPrivateTag/Blocknoの有無から決まる並び順の位置を使う
+    """
+
+    def __init__(
+        self,
+        header: List[str],
+        columns: List[Column],
+        private_tag_column: str = "From_PrivateTag",
+    ):
+        self.has_private_tag = private_tag_column in header
+        self.has_blockno = "Blockno" in header
+        self.index: Dict[str, int] = dict()
+
+        layout = [
+            column
+            for column in columns
+            if column[2] is None
+            or (column[2] == PRIVATE_TAG and self.has_private_tag)
+            or (column[2] == BLOCKNO and self.has_blockno)
+        ]
+        by_name = self.find_by_name(header, layout)
+        if by_name is not None:
+            self.index = by_name
+        else:
+            self.index = {key: i for i, (key, _, _) in enumerate(layout)}
+
+    @classmethod
+    def find_by_name(
+        cls, header: List[str], layout: List[Column]
+    ) -> Optional[Dict[str, int]]:
+        names = [name.strip() for name in header]
+        index: Dict[str, int] = dict()
+        for key, pattern, condition in layout:
+            if condition == PRIVATE_TAG:
+                # 使わない列
+                continue
+            regex = re.compile(pattern, re.IGNORECASE)
+            found = [i for i, name in enumerate(names) if regex.fullmatch(name)]
+            if len(found) == 1:
+                index[key] = found[0]
+            elif len(found) > 1 or key != "private_note":
+                return None
+        return index
+
+    def get(self, record: List[str], key: str, default: str = "") -> str:
+        i = self.index.get(key)
+        if i is None or i >= len(record):
+            return default
+        return record[i]
+
+    def get_address(self, record: List[str], key: str) -> str:
+        """小文字にしたアドレス、同じアドレスは同じ文字列を共有する"""
+        return intern(self.get(record, key).lower())
+
+    def has(self, key: str) -> bool:
+        return key in self.index
+
+
+@functools.cache
+def compile_column_map(record_class: type, header: Tuple[str, ...]) -> ColumnMap:
+    """同じヘッダーのColumnMapは1回だけ作る"""
+    return record_class.make_column_map(list(header))
 
 
 class TradeAttribute(Enum):
@@ -77,6 +248,37 @@ class AnalyzeCsvError(Exception):
 
 
 class OutputRecord:
+    __slots__ = (
+        "network",
+        "my_address",
+        "txhash",
+        "date_time",
+        "method",
+        "counterparty",
+        "counterparty_name",
+        "trade",
+        "application",
+        "status",
+        "manual_selling_price",
+        "manual_selling_cost",
+        "manual_currency_rate",
+        "quantity",
+        "currency",
+        "currency_rate",
+        "fiat_quantity",
+        "fiat_currency",
+        "fee_quantity",
+        "fee_currency",
+        "fee_currency_rate",
+        "fee_fiat_quantity",
+        "fee_fiat_currency",
+        "dallar_yen",
+        "result_selling_price",
+        "result_selling_cost",
+        "result_fee_fiat_quantity",
+        "private_note",
+    )
+
     def __init__(
         self,
         network: str,
@@ -178,30 +380,88 @@ class OutputRecord:
 
 
 class AbstractRecord(metaclass=abc.ABCMeta):
+    # レコードはアドレスの全ネットワーク分を同時に持つので__dict__を作らない
+    # 各クラスで追加する属性はそのクラスの__slots__に書く
+    __slots__ = (
+        "is_skip",
+        "network",
+        "my_address",
+        "name",
+        "txhash",
+        "blockno",
+        "_unix_timestamp",
+        "timestamp",
+        "_date_time",
+        "_date_time_str",
+        "date_time",
+        "txn_from",
+        "txn_to",
+        "contract_address",
+        "private_note",
+        "attributes",
+        "trade",
+        "counterparty",
+        "unit_price",
+        "quantity",
+        "fiat_quantity",
+    )
+
     def __init__(self, network: Network, my_address: str, name: str, header, record):
         self.is_skip = False
 
         self.network = network
-        self.my_address = my_address.lower()
+        self.my_address = intern(my_address.lower())
         self.name = name
 
-    def get_date_time(self, format: str = "%Y/%m/%d %H:%M:%S") -> str:
-        date_time = datetime.fromtimestamp(int(self.unix_timestamp), tz=JST)
-        date_time_str = date_time.strftime(format)
-        return date_time_str
+    @classmethod
+    def make_column_map(cls, header: List[str]) -> ColumnMap:
+        raise NotImplementedError()
 
-    def get_trading_date(self) -> str:
-        format: str = "%Y/%m/%d"
-        date_time = datetime.fromtimestamp(int(self.unix_timestamp), tz=JST)
-        # 朝08:59:59までを前日と見なすための基準時間を生成
-        cutoff_time = datetime(
-            date_time.year, date_time.month, date_time.day, 8, 59, 59, tzinfo=JST
+    @classmethod
+    def get_column_map(cls, header) -> ColumnMap:
+        """ファイルごとに作ったColumnMapはそのまま、ヘッダーのリストは変換して返す"""
+        if isinstance(header, ColumnMap):
+            return header
+        return compile_column_map(cls, tuple(header))
+
+    @property
+    def unix_timestamp(self) -> str:
+        return self._unix_timestamp
+
+    @unix_timestamp.setter
+    def unix_timestamp(self, value: str):
+        # 数値への変換は設定時に1回だけ行い、日時の文字列は初回の利用時に作る
+        self._unix_timestamp = value
+        self.timestamp = int(value)
+        self._date_time = None
+        self._date_time_str = None
+
+    def get_jst_date_time(self) -> datetime:
+        if self._date_time is None:
+            self._date_time = datetime.fromtimestamp(self.timestamp, tz=JST)
+        return self._date_time
+
+    def get_date_time(self, format: str = DATE_TIME_FORMAT) -> str:
+        if format != DATE_TIME_FORMAT:
+            return self.get_jst_date_time().strftime(format)
+        if self._date_time_str is None:
+            self._date_time_str = self.get_jst_date_time().strftime(format)
+        return self._date_time_str
+
+    def get_rate_symbol(self) -> Optional[str]:
+        """レートを引くシンボル、レートを使わないレコードはNone"""
+        return None
+
+    def get_unit_price(self):
+        if _deferred_pricing.get():
+            # price_recordsでまとめて設定する
+            return NOT_AVAILABLE
+        return get_rate(
+            self.get_rate_symbol(), self.get_trading_date(), get_rate_index()
         )
-        # もし基準時間より前なら、日付を1日減らす
-        if date_time <= cutoff_time:
-            date_time -= timedelta(days=1)
-        date_time_str = date_time.strftime(format)
-        return date_time_str
+
+    def get_trading_date(self) -> str:
+        return format_trading_date(self.timestamp // SECONDS_PER_DAY)
 
     def get_counterparty(self):
         counterparty = (
@@ -210,10 +470,24 @@ class AbstractRecord(metaclass=abc.ABCMeta):
         counterparty = counterparty if counterparty != "" else self.contract_address
         return counterparty
 
+    def get_fields(self) -> dict:
+        """設定済みの属性を__slots__の順に返す(__dict__の代わり)"""
+        fields = dict()
+        for cls in reversed(type(self).__mro__):
+            for key in cls.__dict__.get("__slots__", ()):
+                if hasattr(self, key):
+                    # propertyの値を持つ属性はpropertyの名前で返す
+                    name = key.lstrip("_")
+                    if not isinstance(getattr(cls, name, None), property):
+                        name = key
+                    fields[name] = getattr(self, key)
+        fields.update(getattr(self, "__dict__", {}))
+        return fields
+
     def __repr__(self):
         #: Columns.
         user_dict = dict(
-            filter(lambda item: item[0] != "password", self.__dict__.items())
+            filter(lambda item: item[0] != "password", self.get_fields().items())
         )
         columns = ", ".join(
             [
@@ -227,6 +501,17 @@ class AbstractRecord(metaclass=abc.ABCMeta):
 
 
 class TransactionRecord(AbstractRecord):
+    __slots__ = (
+        "value_in_eth",
+        "value_out_eth",
+        "current_value_eth",
+        "txn_fee_eth",
+        "txn_fee_usd",
+        "historical_price_eth",
+        "status",
+        "err_code",
+        "method",
+    )
     status_white_list = ["", "error(0)", "error(1)"]
     err_code_white_list = [
         "",
@@ -238,40 +523,56 @@ class TransactionRecord(AbstractRecord):
         "invalid opcode: opcode 0xa9 not defined",
     ]
 
+    columns: List[Column] = [
+        ("txhash", r"txhash", None),
+        ("blockno", r"blockno", None),
+        ("unix_timestamp", r"unixtimestamp", None),
+        ("date_time", r"datetime.*", None),
+        ("txn_from", r"from", None),
+        ("from_private_tag", r"from_privatetag", PRIVATE_TAG),
+        ("txn_to", r"to", None),
+        ("to_private_tag", r"to_privatetag", PRIVATE_TAG),
+        ("contract_address", r"contractaddress", None),
+        ("value_in_eth", r"value_in\(.*\)", None),
+        ("value_out_eth", r"value_out\(.*\)", None),
+        ("current_value_eth", r"currentvalue.*", None),
+        ("txn_fee_eth", r"txnfee\((?!usd\)).*\)", None),
+        ("txn_fee_usd", r"txnfee\(usd\)", None),
+        ("historical_price_eth", r"historical \$price.*", None),
+        ("status", r"status", None),
+        ("err_code", r"errcode", None),
+        ("method", r"method", None),
+        ("private_note", r"privatenote", None),
+    ]
+
     def __init__(self, network: Network, my_address: str, name: str, header, record):
         super().__init__(network, my_address, name, header, record)
 
-        record = copy.copy(record)
-        self.analyze_header(header)
-
-        self.txhash = record.pop(0)
-        self.blockno = record.pop(0)
-        self.unix_timestamp = record.pop(0)
-        self.date_time = record.pop(0)
-        self.txn_from = record.pop(0).lower()
-        if self.has_private_tag:
-            # from private tag
-            record.pop(0)
-        self.txn_to = record.pop(0).lower()
-        if self.has_private_tag:
-            # from private tag
-            record.pop(0)
-        self.contract_address = record.pop(0).lower()
-        self.value_in_eth = to_decimal(record.pop(0))
-        self.value_out_eth = to_decimal(record.pop(0))
-        self.current_value_eth = record.pop(0)
-        self.txn_fee_eth = to_decimal(record.pop(0))
-        self.txn_fee_usd = record.pop(0)
-        self.historical_price_eth = record.pop(0)
-        self.status = record.pop(0)
-        self.err_code = record.pop(0)
-        self.method = record.pop(0)
-        self.private_note = record.pop(0) if len(record) > 0 else ""
+        columns = self.get_column_map(header)
+
+        self.txhash = intern(columns.get(record, "txhash"))
+        self.blockno = columns.get(record, "blockno")
+        self.unix_timestamp = columns.get(record, "unix_timestamp")
+        self.date_time = columns.get(record, "date_time")
+        self.txn_from = columns.get_address(record, "txn_from")
+        self.txn_to = columns.get_address(record, "txn_to")
+        self.contract_address = columns.get_address(record, "contract_address")
+        self.value_in_eth = to_decimal(columns.get(record, "value_in_eth"))
+        self.value_out_eth = to_decimal(columns.get(record, "value_out_eth"))
+        self.current_value_eth = columns.get(record, "current_value_eth")
+        self.txn_fee_eth = to_decimal(columns.get(record, "txn_fee_eth"))
+        self.txn_fee_usd = columns.get(record, "txn_fee_usd")
+        self.historical_price_eth = columns.get(record, "historical_price_eth")
+        self.status = columns.get(record, "status")
+        self.err_code = columns.get(record, "err_code")
+        self.method = columns.get(record, "method")
+        self.private_note = columns.get(record, "private_note")
 
         self.calc()
 
-    def analyze_header(self, header):
-        self.has_private_tag = True if "From_PrivateTag" in header else False
+    @classmethod
+    def make_column_map(cls, header: List[str]) -> ColumnMap:
+        return ColumnMap(header, cls.columns)
 
     def validate(self):
         if self.value_in_eth != 0 and self.value_out_eth != 0:
@@ -306,9 +607,7 @@ class TransactionRecord(AbstractRecord):
 
         self.trade = ""
         self.counterparty = self.get_counterparty()
-        self.unit_price = get_rate(
-            self.network["symbol"], self.get_trading_date(), rate_df
-        )
+        self.unit_price = self.get_unit_price()
 
         # 通常In/Outは排他
         # ブリッジ/自己送金の時は両方に同じ値が入る
@@ -327,12 +626,16 @@ class TransactionRecord(AbstractRecord):
                 self.value_out_eth = 0
 
         self.quantity = self.get_quantity()
-        self.fiat_quantity = (
-            self.unit_price * self.quantity if self.unit_price != "N/A" else "N/A"
-        )
+        self.fiat_quantity = self.get_fiat_quantity()
 
         self.validate()
 
+    def get_rate_symbol(self) -> str:
+        return self.network["symbol"]
+
+    def get_fiat_quantity(self):
+        return self.unit_price * self.quantity if self.unit_price != "N/A" else "N/A"
+
     def get_quantity(self) -> Decimal:
         quantity = (
             self.value_in_eth if self.value_in_eth != 0 else -1 * self.value_out_eth
@@ -349,50 +652,76 @@ class TransactionRecord(AbstractRecord):
 
 
 class InternalTxnRecord(AbstractRecord):
+    __slots__ = (
+        "parent_txn_from",
+        "parent_txn_to",
+        "parent_txn_eth_value",
+        "value_in_eth",
+        "value_out_eth",
+        "current_value_eth",
+        "historical_price_eth",
+        "status",
+        "err_code",
+        "type",
+    )
     status_white_list = ["", "0"]
     err_code_white_list = [""]
+    columns: List[Column] = [
+        ("txhash", r"txhash", None),
+        ("blockno", r"blockno", None),
+        ("unix_timestamp", r"unixtimestamp", None),
+        ("date_time", r"datetime.*", None),
+        ("parent_txn_from", r"parenttxfrom", None),
+        ("parent_from_private_tag", r"parenttxfrom_privatetag", PRIVATE_TAG),
+        ("parent_txn_to", r"parenttxto", None),
+        ("parent_to_private_tag", r"parenttxto_privatetag", PRIVATE_TAG),
+        ("parent_txn_eth_value", r"parenttx.*_value", None),
+        ("txn_from", r"from", None),
+        ("from_private_tag", r"from_privatetag", PRIVATE_TAG),
+        ("txn_to", r"txto", None),
+        ("to_private_tag", r"txto_privatetag", PRIVATE_TAG),
+        ("contract_address", r"contractaddress", None),
+        ("value_in_eth", r"value_in\(.*\)", None),
+        ("value_out_eth", r"value_out\(.*\)", None),
+        ("current_value_eth", r"currentvalue.*", None),
+        ("historical_price_eth", r"historical \$price.*", None),
+        ("status", r"status", None),
+        ("err_code", r"errcode", None),
+        ("type", r"type", None),
+        ("private_note", r"privatenote", None),
+    ]
 
     def __init__(self, network: Network, my_address: str, name: str, header, record):
         super().__init__(network, my_address, name, header, record)
 
-        record = copy.copy(record)
-        self.analyze_header(header)
-
-        self.txhash = record.pop(0)
-        self.blockno = record.pop(0)
-        self.unix_timestamp = record.pop(0)
-        self.date_time = record.pop(0)
-        self.parent_txn_from = record.pop(0).lower()
-        if self.has_private_tag:
-            # from private tag
-            record.pop(0)
-        self.parent_txn_to = record.pop(0).lower()
-        if self.has_private_tag:
-            # from private tag
-            record.pop(0)
-        self.parent_txn_eth_value = record.pop(0)  # 無視の予定
-        self.txn_from = record.pop(0)
-        if self.has_private_tag:
-            # from private tag
-            record.pop(0)
-        self.txn_to = record.pop(0)
-        if self.has_private_tag:
-            # from private tag
-            record.pop(0)
-        self.contract_address = record.pop(0).lower()
-        self.value_in_eth = to_decimal(record.pop(0))
-        self.value_out_eth = to_decimal(record.pop(0))
-        self.current_value_eth = record.pop(0)
-        self.historical_price_eth = record.pop(0)
-        self.status = record.pop(0)
-        self.err_code = record.pop(0)
-        self.type = record.pop(0)
-        self.private_note = record.pop(0) if len(record) > 0 else ""
+        columns = self.get_column_map(header)
+
+        self.txhash = intern(columns.get(record, "txhash"))
+        self.blockno = columns.get(record, "blockno")
+        self.unix_timestamp = columns.get(record, "unix_timestamp")
+        self.date_time = columns.get(record, "date_time")
+        self.parent_txn_from = columns.get_address(record, "parent_txn_from")
+        self.parent_txn_to = columns.get_address(record, "parent_txn_to")
+        self.parent_txn_eth_value = columns.get(
+            record, "parent_txn_eth_value"
+        )  # 無視の予定
+        self.txn_from = columns.get(record, "txn_from")
+        self.txn_to = columns.get(record, "txn_to")
+        self.contract_address = columns.get_address(record, "contract_address")
+        self.value_in_eth = to_decimal(columns.get(record, "value_in_eth"))
+        self.value_out_eth = to_decimal(columns.get(record, "value_out_eth"))
+        self.current_value_eth = columns.get(record, "current_value_eth")
+        self.historical_price_eth = columns.get(record, "historical_price_eth")
+        self.status = columns.get(record, "status")
+        self.err_code = columns.get(record, "err_code")
+        self.type = columns.get(record, "type")
+        self.private_note = columns.get(record, "private_note")
 
         self.calc()
 
-    def analyze_header(self, header):
-        self.has_private_tag = True if "ParentTxFrom_PrivateTag" in header else False
+    @classmethod
+    def make_column_map(cls, header: List[str]) -> ColumnMap:
+        return ColumnMap(header, cls.columns, "ParentTxFrom_PrivateTag")
 
     def validate(self):
         if self.txn_from == self.my_address and self.txn_to == self.my_address:
@@ -423,16 +752,18 @@ class InternalTxnRecord(AbstractRecord):
 
         self.trade = ""
         self.counterparty = self.get_counterparty()
-        self.unit_price = get_rate(
-            self.network["symbol"], self.get_trading_date(), rate_df
-        )
+        self.unit_price = self.get_unit_price()
         self.quantity = self.get_quantity()
-        self.fiat_quantity = (
-            self.unit_price * self.quantity if self.unit_price != "N/A" else "N/A"
-        )
+        self.fiat_quantity = self.get_fiat_quantity()
 
         self.validate()
 
+    def get_rate_symbol(self) -> str:
+        return self.network["symbol"]
+
+    def get_fiat_quantity(self):
+        return self.unit_price * self.quantity if self.unit_price != "N/A" else "N/A"
+
     def get_quantity(self) -> Decimal:
         quantity = self.value_in_eth if self.value_in_eth != 0 else self.value_out_eth
         return quantity
@@ -443,30 +774,47 @@ class InternalTxnRecord(AbstractRecord):
 
 
 class Erc20TxnRecord(AbstractRecord):
+    __slots__ = (
+        "value",
+        "historical_value_usd",
+        "token_name",
+        "token_symbol",
+        "adjustment_unit_price",
+    )
+    columns: List[Column] = [
+        ("txhash", r"txhash", None),
+        ("blockno", r"blockno", BLOCKNO),
+        ("unix_timestamp", r"unixtimestamp", None),
+        ("date_time", r"datetime.*", None),
+        ("txn_from", r"from", None),
+        ("from_private_tag", r"from_privatetag", PRIVATE_TAG),
+        ("txn_to", r"to", None),
+        ("to_private_tag", r"to_privatetag", PRIVATE_TAG),
+        ("value", r"tokenvalue", None),
+        ("historical_value_usd", r"usdvaluedayoftx", None),
+        ("contract_address", r"contractaddress", None),
+        ("token_name", r"tokenname", None),
+        ("token_symbol", r"tokensymbol", None),
+        ("private_note", r"privatenote", None),
+    ]
+
     def __init__(self, network: Network, my_address: str, name: str, header, record):
         super().__init__(network, my_address, name, header, record)
 
-        record = copy.copy(record)
-        self.analyze_header(header)
-
-        self.txhash = record.pop(0)
-        self.blockno = record.pop(0) if self.has_blockno else ""
-        self.unix_timestamp = record.pop(0)
-        self.date_time = record.pop(0)
-        self.txn_from = record.pop(0).lower()
-        if self.has_private_tag:
-            # from private tag
-            record.pop(0)
-        self.txn_to = record.pop(0).lower()
-        if self.has_private_tag:
-            # from private tag
-            record.pop(0)
-        self.value = to_decimal(record.pop(0))
-        self.historical_value_usd = record.pop(0)
-        self.contract_address = record.pop(0).lower()
-        self.token_name = record.pop(0)
-        self.token_symbol = self.get_fixed_symbol(record.pop(0))
-        self.private_note = record.pop(0) if len(record) > 0 else ""
+        columns = self.get_column_map(header)
+
+        self.txhash = intern(columns.get(record, "txhash"))
+        self.blockno = columns.get(record, "blockno")
+        self.unix_timestamp = columns.get(record, "unix_timestamp")
+        self.date_time = columns.get(record, "date_time")
+        self.txn_from = columns.get_address(record, "txn_from")
+        self.txn_to = columns.get_address(record, "txn_to")
+        self.value = to_decimal(columns.get(record, "value"))
+        self.historical_value_usd = columns.get(record, "historical_value_usd")
+        self.contract_address = columns.get_address(record, "contract_address")
+        self.token_name = columns.get(record, "token_name")
+        self.token_symbol = self.get_fixed_symbol(columns.get(record, "token_symbol"))
+        self.private_note = columns.get(record, "private_note")
 
         self.adjustment_unit_price = ""
 
@@ -480,9 +828,9 @@ class Erc20TxnRecord(AbstractRecord):
 
         self.calc()
 
-    def analyze_header(self, header):
-        self.has_private_tag = True if "From_PrivateTag" in header else False
-        self.has_blockno = True if "Blockno" in header else False
+    @classmethod
+    def make_column_map(cls, header: List[str]) -> ColumnMap:
+        return ColumnMap(header, cls.columns)
 
     def validate(self):
         pass
@@ -503,14 +851,18 @@ class Erc20TxnRecord(AbstractRecord):
         self.evalute_attribute()
         self.trade = ""
         self.counterparty = self.get_counterparty()
-        self.unit_price = get_rate(self.token_symbol, self.get_trading_date(), rate_df)
+        self.unit_price = self.get_unit_price()
         self.quantity = self.get_quantity()
-        self.fiat_quantity = (
-            self.unit_price * self.quantity if self.unit_price != "N/A" else ""
-        )
+        self.fiat_quantity = self.get_fiat_quantity()
 
         self.validate()
 
+    def get_rate_symbol(self) -> str:
+        return self.token_symbol
+
+    def get_fiat_quantity(self):
+        return self.unit_price * self.quantity if self.unit_price != "N/A" else ""
+
     def get_quantity(self) -> Decimal:
         quantity = self.value
         if self.txn_from == self.my_address:
@@ -535,68 +887,78 @@ class Erc20TxnRecord(AbstractRecord):
 
 
 class Erc721TxnRecord(AbstractRecord):
+    __slots__ = ("token_name", "token_symbol", "token_id", "is_erc721")
+    columns: List[Column] = [
+        ("txhash", r"txhash", None),
+        ("blockno", r"blockno", BLOCKNO),
+        ("unix_timestamp", r"unixtimestamp", None),
+        ("date_time", r"datetime.*", None),
+        ("txn_from", r"from", None),
+        ("from_private_tag", r"from_privatetag", PRIVATE_TAG),
+        ("txn_to", r"to", None),
+        ("to_private_tag", r"to_privatetag", PRIVATE_TAG),
+        ("contract_address", r"contractaddress", None),
+        ("token_id", r"tokenid", None),
+        ("token_name", r"tokenname", None),
+        ("token_symbol", r"tokensymbol", None),
+        ("private_note", r"privatenote", None),
+    ]
+    new_format_columns: List[Column] = [
+        ("txhash", r"txhash", None),
+        ("blockno", r"blockno", BLOCKNO),
+        ("unix_timestamp", r"unixtimestamp", None),
+        ("date_time", r"datetime.*", None),
+        ("txn_from", r"from", None),
+        ("from_private_tag", r"from_privatetag", PRIVATE_TAG),
+        ("txn_to", r"to", None),
+        ("to_private_tag", r"to_privatetag", PRIVATE_TAG),
+        ("contract_address", r"contractaddress", None),
+        ("token_name", r"tokenname", None),
+        ("token_symbol", r"tokensymbol", None),
+        ("token_id", r"tokenid", None),
+        ("type", r"type", None),
+        ("quantity", r"quantity", None),
+        ("private_note", r"privatenote", None),
+    ]
+
     def __init__(self, network: Network, my_address: str, name: str, header, record):
         super().__init__(network, my_address, name, header, record)
 
-        record = copy.copy(record)
-        self.analyze_header(header)
+        columns = self.get_column_map(header)
 
         self.is_erc721 = (
             True
-            if not self.is_new_format or record[header.index("Type")] == "721"
+            if not columns.has("type") or columns.get(record, "type") == "721"
             else False
         )
 
         if not self.is_erc721:
             self.is_skip = True
             return
-        if self.is_new_format:
-            self.txhash = record.pop(0)
-            self.blockno = record.pop(0) if self.has_blockno else ""
-            self.unix_timestamp = record.pop(0)
-            self.date_time = record.pop(0)
-            self.txn_from = record.pop(0).lower()
-            if self.has_private_tag:
-                # from private tag
-                record.pop(0)
-            self.txn_to = record.pop(0).lower()
-            if self.has_private_tag:
-                # from private tag
-                record.pop(0)
-            self.contract_address = record.pop(0).lower()
-            self.token_name = record.pop(0)
-            self.token_symbol = record.pop(0)
-            self.token_id = record.pop(0)
-            record.pop(0)  # Type
-            self.quantity = int(record.pop(0))
-            self.private_note = record.pop(0) if len(record) > 0 else ""
-
+        self.txhash = intern(columns.get(record, "txhash"))
+        self.blockno = columns.get(record, "blockno")
+        self.unix_timestamp = columns.get(record, "unix_timestamp")
+        self.date_time = columns.get(record, "date_time")
+        self.txn_from = columns.get_address(record, "txn_from")
+        self.txn_to = columns.get_address(record, "txn_to")
+        self.contract_address = columns.get_address(record, "contract_address")
+        self.token_name = columns.get(record, "token_name")
+        self.token_symbol = columns.get(record, "token_symbol")
+        self.token_id = columns.get(record, "token_id")
+        if columns.has("quantity"):
+            self.quantity = int(columns.get(record, "quantity"))
         else:
-            self.txhash = record.pop(0)
-            self.blockno = record.pop(0) if self.has_blockno else ""
-            self.unix_timestamp = record.pop(0)
-            self.date_time = record.pop(0)
-            self.txn_from = record.pop(0).lower()
-            if self.has_private_tag:
-                # from private tag
-                record.pop(0)
-            self.txn_to = record.pop(0).lower()
-            if self.has_private_tag:
-                # from private tag
-                record.pop(0)
-            self.contract_address = record.pop(0).lower()
-            self.token_id = record.pop(0)
-            self.token_name = record.pop(0)
-            self.token_symbol = record.pop(0)
             self.quantity = 1
-            self.private_note = record.pop(0) if len(record) > 0 else ""
+        self.private_note = columns.get(record, "private_note")
 
         self.calc()
 
-    def analyze_header(self, header):
-        self.is_new_format = True if "Type" in header else False
-        self.has_private_tag = True if "From_PrivateTag" in header else False
-        self.has_blockno = True if "Blockno" in header else False
+    @classmethod
+    def make_column_map(cls, header: List[str]) -> ColumnMap:
+        # Type列がある場合は721/1155をまとめた新しい形式
+        if "Type" in header:
+            return ColumnMap(header, cls.new_format_columns)
+        return ColumnMap(header, cls.columns)
 
     def validate(self):
         pass
@@ -624,67 +986,79 @@ class Erc721TxnRecord(AbstractRecord):
 
 
 class Erc1155TxnRecord(AbstractRecord):
+    __slots__ = ("token_name", "token_symbol", "token_id", "is_erc1155")
+    columns: List[Column] = [
+        ("txhash", r"txhash", None),
+        ("blockno", r"blockno", BLOCKNO),
+        ("unix_timestamp", r"unixtimestamp", None),
+        ("date_time", r"datetime.*", None),
+        ("txn_from", r"from", None),
+        ("from_private_tag", r"from_privatetag", PRIVATE_TAG),
+        ("txn_to", r"to", None),
+        ("to_private_tag", r"to_privatetag", PRIVATE_TAG),
+        ("contract_address", r"contractaddress", None),
+        ("token_id", r"tokenid", None),
+        ("quantity", r"tokenvalue", None),
+        ("token_name", r"tokenname", None),
+        ("token_symbol", r"tokensymbol", None),
+        ("private_note", r"privatenote", None),
+    ]
+    new_format_columns: List[Column] = [
+        ("txhash", r"txhash", None),
+        ("blockno", r"blockno", BLOCKNO),
+        ("unix_timestamp", r"unixtimestamp", None),
+        ("date_time", r"datetime.*", None),
+        ("txn_from", r"from", None),
+        ("from_private_tag", r"from_privatetag", PRIVATE_TAG),
+        ("txn_to", r"to", None),
+        ("to_private_tag", r"to_privatetag", PRIVATE_TAG),
+        ("contract_address", r"contractaddress", None),
+        ("token_name", r"tokenname", None),
+        ("token_symbol", r"tokensymbol", None),
+        ("token_id", r"tokenid", None),
+        ("type", r"type", None),
+        ("quantity", r"quantity", None),
+        ("private_note", r"privatenote", None),
+    ]
+
     def __init__(self, network: Network, my_address: str, name: str, header, record):
         super().__init__(network, my_address, name, header, record)
 
-        record = copy.copy(record)
-        self.analyze_header(header)
+        columns = self.get_column_map(header)
 
         self.is_erc1155 = (
             True
-            if not self.is_new_format or record[header.index("Type")] == "1155"
+            if not columns.has("type") or columns.get(record, "type") == "1155"
             else False
         )
 
         if not self.is_erc1155:
             self.is_skip = True
             return
-        if self.is_new_format:
-            self.txhash = record.pop(0)
-            self.blockno = record.pop(0) if self.has_blockno else ""
-            self.unix_timestamp = record.pop(0)
-            self.date_time = record.pop(0)
-            self.txn_from = record.pop(0).lower()
-            if self.has_private_tag:
-                # from private tag
-                record.pop(0)
-            self.txn_to = record.pop(0).lower()
-            if self.has_private_tag:
-                # from private tag
-                record.pop(0)
-            self.contract_address = record.pop(0).lower()
-            self.token_name = record.pop(0)
-            self.token_symbol = record.pop(0)
-            self.token_id = record.pop(0)
-            record.pop(0)  # Type
-            self.quantity = int(record.pop(0))
-            self.private_note = record.pop(0) if len(record) > 0 else ""
+        self.txhash = intern(columns.get(record, "txhash"))
+        self.blockno = columns.get(record, "blockno")
+        self.unix_timestamp = columns.get(record, "unix_timestamp")
+        self.date_time = columns.get(record, "date_time")
+        self.txn_from = columns.get_address(record, "txn_from")
+        self.txn_to = columns.get_address(record, "txn_to")
+        self.contract_address = columns.get_address(record, "contract_address")
+        self.token_name = columns.get(record, "token_name")
+        self.token_symbol = columns.get(record, "token_symbol")
+        self.token_id = columns.get(record, "token_id")
+        if columns.has("quantity"):
+            self.quantity = int(columns.get(record, "quantity"))
         else:
-            self.txhash = record.pop(0)
-            self.blockno = record.pop(0) if self.has_blockno else ""
-            self.unix_timestamp = record.pop(0)
-            self.date_time = record.pop(0)
-            self.txn_from = record.pop(0).lower()
-            if self.has_private_tag:
-                # from private tag
-                record.pop(0)
-            self.txn_to = record.pop(0).lower()
-            if self.has_private_tag:
-                # from private tag
-                record.pop(0)
-            self.contract_address = record.pop(0).lower()
-            self.token_id = record.pop(0)
-            self.quantity = int(record.pop(0))
-            self.token_name = record.pop(0)
-            self.token_symbol = record.pop(0)
-            self.private_note = record.pop(0) if len(record) > 0 else ""
+            self.quantity = 1
+        self.private_note = columns.get(record, "private_note")
 
         self.calc()
 
-    def analyze_header(self, header):
-        self.is_new_format = True if "Type" in header else False
-        self.has_private_tag = True if "From_PrivateTag" in header else False
-        self.has_blockno = True if "Blockno" in header else False
+    @classmethod
+    def make_column_map(cls, header: List[str]) -> ColumnMap:
+        # Type列がある場合は721/1155をまとめた新しい形式
+        if "Type" in header:
+            return ColumnMap(header, cls.new_format_columns)
+        return ColumnMap(header, cls.columns)
 
     def validate(self):
         pass
@@ -1434,7 +1808,11 @@ class TransactionGroup:
                 self.transaction_record.unit_price,
                 "",  # calc
                 "USD",
-                get_rate("USDJPY", self.transaction_record.get_trading_date(), rate_df),
+                get_rate(
+                    "USDJPY",
+                    self.transaction_record.get_trading_date(),
+                    get_rate_index(),
+                ),
                 "",
                 "",
                 "",
@@ -1467,7 +1845,7 @@ class TransactionGroup:
                 "",
                 "",  # calc
                 "USD",
-                get_rate("USDJPY", txn_record.get_trading_date(), rate_df),
+                get_rate("USDJPY", txn_record.get_trading_date(), get_rate_index()),
                 "",
                 "",
                 "",
@@ -1501,7 +1879,7 @@ class TransactionGroup:
                 "",
                 "",  # calc
                 "USD",
-                get_rate("USDJPY", txn_record.get_trading_date(), rate_df),
+                get_rate("USDJPY", txn_record.get_trading_date(), get_rate_index()),
                 "",
                 "",
                 "",
@@ -1535,7 +1913,7 @@ class TransactionGroup:
                 "",
                 "",  # calc
                 "USD",
-                get_rate("USDJPY", txn_record.get_trading_date(), rate_df),
+                get_rate("USDJPY", txn_record.get_trading_date(), get_rate_index()),
                 "",
                 "",
                 "",
@@ -1569,7 +1947,7 @@ class TransactionGroup:
                 "",
                 "",  # calc
                 "USD",
-                get_rate("USDJPY", txn_record.get_trading_date(), rate_df),
+                get_rate("USDJPY", txn_record.get_trading_date(), get_rate_index()),
                 "",
                 "",
                 "",
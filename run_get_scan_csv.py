@@ -1,8 +1,11 @@
+import asyncio
 from datetime import datetime  # noqa: E402
 from zoneinfo import ZoneInfo
 
 from scan_api import (
     SCAN_MAPPING,
+    convert_raw,
+    get_scan_csv_async,
     get_txlist,
     get_txlist_internal,
     get_txlist_token,
@@ -25,11 +28,39 @@ start_jst = datetime(2024, 8, 25, 0, 0, 0, tzinfo=ZoneInfo("Asia/Tokyo"))
 end_jst = datetime(2024, 10, 1, 0, 0, 0, tzinfo=ZoneInfo("Asia/Tokyo"))
 # start_jst = None
 # end_jst = None
+# Trueにすると全ネットワーク・全actionを同時に問い合わせる
+use_async = False
+# Trueにすると前回取得したブロック以降だけを取得して既存のcsvに追記する
+incremental = False
+# Trueにすると問い合わせずにoutput/<address>/<network>/rawからcsvを作り直す
+offline = False
 
-for scan in scans:
-    get_txlist(scan, address, start_jst, end_jst, output_directory)
-    get_txlist_internal(scan, address, start_jst, end_jst, output_directory)
-    get_txlist_token(scan, address, start_jst, end_jst, output_directory)
-    get_txlist_tokennft(scan, address, start_jst, end_jst, output_directory)
-    if scan.has_erc1155:
-        get_txlist_token1155(scan, address, start_jst, end_jst, output_directory)
+if offline:
+    convert_raw(scans, address, output_directory)
+elif use_async:
+    asyncio.run(
+        get_scan_csv_async(
+            scans,
+            address,
+            start_jst,
+            end_jst,
+            output_directory,
+            incremental=incremental,
+        )
+    )
+else:
+    for scan in scans:
+        get_txlist(scan, address, start_jst, end_jst, output_directory, incremental)
+        get_txlist_internal(
+            scan, address, start_jst, end_jst, output_directory, incremental
+        )
+        get_txlist_token(
+            scan, address, start_jst, end_jst, output_directory, incremental
+        )
+        get_txlist_tokennft(
+            scan, address, start_jst, end_jst, output_directory, incremental
+        )
+        if scan.has_erc1155:
+            get_txlist_token1155(
+                scan, address, start_jst, end_jst, output_directory, incremental
+            )
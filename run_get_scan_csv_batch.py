@@ -0,0 +1,13 @@
+from scan_api.batch import run_batch
+from util.logger import setup_logger
+
+setup_logger()
+
+# 書式は scan_api/batch.py の load_manifest を参照
+manifest_path = "./manifest.json"
+# 同時に処理する job 数、リクエスト間隔は Scan ごとに制御される
+max_workers = 8
+# Trueにすると前回 done にならなかった job だけを実行する
+retry = False
+
+run_batch(manifest_path, max_workers=max_workers, retry=retry)
@@ -1,13 +1,13 @@
-import copy
 import csv
 import os
-import re
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from itertools import groupby
-from typing import List, Set, TypedDict
+from itertools import groupby, islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple, TypedDict
 
+from history_calc import HistoryCalculator
 from models import (
     BASE_SYMBOLS,
     NETWORKS,
@@ -22,11 +22,14 @@ from models import (
     TransactionGroup,
     TransactionRecord,
     TransationFileMap,
-    TransationRecordsMap,
+    deferred_pricing,
+    get_rate_index,
+    price_records,
 )
+from util.formula import FormulaTemplate
 from util.logger import get_logger, setup_logger
 from util.util import to_decimal
-from wopenpyxl import WOpenpyxl
+from wopenpyxl import WOpenpyxl, WriteOnlyWOpenpyxl
 
 setup_logger()
 logger = get_logger()
@@ -45,13 +48,67 @@ TARGET_FILES: List[TransationFileMap] = [
     {"class": [Erc721TxnRecord, Erc1155TxnRecord], "file_name": "nfts.csv"},
 ]
 
+# ネットワークを並列に処理するプロセス数、1の場合は順番に処理する
+# 並列にする場合は os.cpu_count() などを指定する
+MAX_WORKERS = 1
+# アドレスを並列に処理するプロセス数、1の場合は順番に処理する
+ADDRESS_WORKERS = 1
+# アドレスを並列に処理する場合のワーカーごとのメモリの上限(MB)、Noneは無制限
+MEMORY_LIMIT_MB: Optional[int] = None
+# Trueの場合はxlsxを書き込み専用で行ごとに出力する、Falseはテンプレートを編集して出力する
+OUTPUT_WRITE_ONLY = True
+# Trueの場合は数式の列を列ごとの共有数式で出力する(OUTPUT_WRITE_ONLYの場合のみ)
+OUTPUT_SHARED_FORMULA = True
+# Trueの場合は残高や売却原価などを計算せずにテンプレートの数式で出力する
+# Falseの場合はPythonで計算した値を出力する(OUTPUT_WRITE_ONLYの場合のみ)
+OUTPUT_FORMULA = False
+
+# データ行に設定する表示形式
+CELL_NUMBER_FORMATS = {
+    11: "0.000000",  # K
+    12: "0.000000",  # L
+    13: "0.000000",  # M
+    14: "0.000000",  # N
+    15: "0.000000",  # O
+    16: "0.000000",  # P
+    17: "0.000000",  # Q
+    19: "0.000000",  # S
+    21: "0.000000",  # U
+    22: "0.000000",  # V
+    24: "0.000000",  # X
+    25: "0.00",  # Y
+    26: "0.00",  # Z
+    27: "0.00",  # AA
+    28: "0.00",  # AB
+    29: "0.00",  # AC
+}
+
+ProcessedNetwork = TypedDict(
+    "ProcessedNetwork",
+    {"network": Network, "data_rows": List[List[str]], "symbols": List[str]},
+)
+
+AddressResult = TypedDict(
+    "AddressResult",
+    {"address": str, "ok": bool, "elapsed": str, "error": Optional[str]},
+)
+
 BASIS_DATE = datetime.now()
 BASIS_PERF_COUNTER = time.perf_counter()
 
 
-def collect_transaction_records(
+def read_csv_row(path: str, index: int) -> List[str]:
+    """エラー出力用にindex行目(ヘッダーが0)を読み直す"""
+    with open(path, encoding="utf8", newline="") as f:
+        return next(islice(csv.reader(f), index, None), [])
+
+
+def iter_transaction_records(
     network: Network, address: str
-) -> List[TransationRecordsMap]:
+) -> Iterator[AbstractRecord]:
+    """CSVを1行ずつ読みながらレコードを返す
+    読んだ行は保持せず、エラーの場合は行番号からその行を読み直して出力する
+    """
     network_path = os.path.join(PATH_DATA, address, network["name"])
 
     name = address
@@ -61,68 +118,102 @@ def collect_transaction_records(
     if name_file:
         name = os.path.splitext(".name")
 
-    records: List[AbstractRecord] = list()
     for target_file in TARGET_FILES:
         target_path = os.path.join(network_path, target_file["file_name"])
         logger.info(f"check {target_path}")
-        if os.path.exists(target_path):
-            logger.info(f"process {target_path}")
-            with open(target_path, encoding="utf8", newline="") as f:
-                csvreader = csv.reader(f)
-                content = [row for row in csvreader]  # 各年のデータを要素とするリスト
-                # logger.info(content)
-                count = -1
-                for row in content:
-                    row_backup = copy.copy(row)
-                    count = count + 1
-                    if count == 0:
-                        header = row
-                        continue
-                    transaction_class_list = target_file["class"]
-                    for transaction_class in transaction_class_list:
-                        try:
-                            record: List[AbstractRecord] = transaction_class(
-                                network, address, name, header, row
-                            )
-                            if not record.is_skip:
-                                records.append(record)
-                            else:
-                                print("skip records.append")
-                        except Exception as e:
-                            import traceback
-
-                            traceback.print_exc()
-                            logger.info("例外args:", e.args)
-                            logger.info("Analyze CSV Error!")
-                            logger.info(
-                                f'target_path: {target_path}, network: {network["name"]}, address: {address}'
-                            )
-                            logger.info(header)
-                            logger.info(row_backup)
-                            raise AnalyzeCsvError(row_backup)
-                        finally:
-                            pass
-                        # pprint.pprint(vars(record))
-        else:
+        if not os.path.exists(target_path):
             logger.info(
                 f'not found {target_file["file_name"]} at {network["name"]}:{address}'
             )
-    return records
+            continue
+
+        logger.info(f"process {target_path}")
+        with open(target_path, encoding="utf8", newline="") as f:
+            csvreader = csv.reader(f)
+            header = next(csvreader, None)
+            if header is None:
+                continue
+            # 列の対応はファイルごとに1回だけ作る
+            column_maps = {
+                transaction_class: transaction_class.get_column_map(header)
+                for transaction_class in target_file["class"]
+            }
+            for count, row in enumerate(csvreader, start=1):
+                for transaction_class in target_file["class"]:
+                    try:
+                        record: AbstractRecord = transaction_class(
+                            network,
+                            address,
+                            name,
+                            column_maps[transaction_class],
+                            row,
+                        )
+                    except Exception as e:
+                        import traceback
+
+                        traceback.print_exc()
+                        row_backup = read_csv_row(target_path, count)
+                        logger.info("例外args:", e.args)
+                        logger.info("Analyze CSV Error!")
+                        logger.info(
+                            f'target_path: {target_path}, row: {count}, network: {network["name"]}, address: {address}'
+                        )
+                        logger.info(header)
+                        logger.info(row_backup)
+                        raise AnalyzeCsvError(row_backup)
+                    if not record.is_skip:
+                        yield record
+                    else:
+                        print("skip records.append")
+
+
+def collect_transaction_records(network: Network, address: str) -> List[AbstractRecord]:
+    return list(iter_transaction_records(network, address))
+
+
+def process_network(network: Network, address: str) -> ProcessedNetwork:
+    """1つのネットワークのCSVを読み込んでシートに書き込む行データにする
+    プロセスプールのワーカーで実行するので結果は行データとシンボルだけにする
+    """
+    with deferred_pricing():
+        records = collect_transaction_records(network, address)
+    # レートはレコードを作り終えてからまとめて設定する
+    price_records(records)
+
+    groups: List[TransactionGroup] = bundle_transaction_groups(records)
+    data_rows: List[List[str]] = convert_group_to_csv_data(groups)
+    symbols = get_used_symbols(groups)
+    logger.info(
+        f'end process_network({network["name"]}): {get_elapsed_time(BASIS_PERF_COUNTER)}'
+    )
+    return {"network": network, "data_rows": data_rows, "symbols": symbols}
 
 
-def collect_transaction_records_for_networks(address: str):
-    records_map_list: List[TransationRecordsMap] = list()
+def process_networks(
+    address: str, max_workers: Optional[int] = None
+) -> List[ProcessedNetwork]:
+    """データのあるネットワークを処理する
+    max_workersが2以上の場合はネットワークごとに別プロセスで処理する
+    結果はNETWORKSの順に返す
+    """
+    networks: List[Network] = list()
     for network in NETWORKS:
         network_path = os.path.join(PATH_DATA, address, network["name"])
         logger.info(f"check {network_path}")
-
         if os.path.exists(network_path):
             logger.info(f"process {network_path}")
-            records = collect_transaction_records(network, address)
-            records_map = {"network": network, "records": records}
-            records_map_list.append(records_map)
+            networks.append(network)
+
+    if max_workers is None:
+        max_workers = MAX_WORKERS
+    max_workers = min(max_workers, len(networks))
+    if max_workers <= 1:
+        return [process_network(network, address) for network in networks]
 
-    return records_map_list
+    # ワーカーでレートを読み直さないように先に読み込んでおく
+    get_rate_index()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(process_network, networks, [address] * len(networks)))
 
 
 def get_used_symbols(groups: List[TransactionGroup]):
@@ -182,35 +273,9 @@ def attach_symbols(
     return return_value2
 
 
-def alpha2num(alpha):
-    num = 0
-    for index, item in enumerate(list(alpha)):
-        num += pow(26, len(alpha) - index - 1) * (ord(item) - ord("A") + 1)
-    return num
-
-
-def num2alpha(num):
-    if num <= 26:
-        return chr(64 + num)
-    elif num % 26 == 0:
-        return num2alpha(num // 26 - 1) + chr(90)
-    else:
-        return num2alpha(num // 26) + chr(64 + num % 26)
-
-
 def spread_formula_symbol(
     book: WOpenpyxl, start_symbol_col_idx: int, end_symbol_col_idx: int
 ):
-    def alphabet_replacer(col_index: int):
-        def alphabet_increment(matchobj):
-            place_holder = matchobj.group(1)[1:-1]
-            number_value = alpha2num(place_holder)
-            alphabet_value = num2alpha(number_value + col_index - start_symbol_col_idx)
-            return alphabet_value
-
-        return alphabet_increment
-
-    regex_string_alphabet = "({[A-Z]+})"
     book.set_active_sheet("template_temp")
 
     # まずは横にのばしてから、もともとの縦に伸ばすやつを実行する
@@ -232,13 +297,10 @@ def spread_formula_symbol(
             logger.info(f"max_cols: {max_cols}")
             logger.info(f"start_symbol_col_idx: {start_symbol_col_idx}")
             logger.info(f"(max_cols - start_symbol_col_idx) / 2: {count_symbols}")
+            formula_template = FormulaTemplate(template_value, START_ROW_IDX)
             for count in range(0, count_symbols + 1):
                 col_idx = c + (count * 2)
-                result = re.sub(
-                    regex_string_alphabet,
-                    alphabet_replacer(col_idx - (c - start_symbol_col_idx)),
-                    template_value,
-                )
+                result = formula_template.render(column_shift=count * 2)
                 # 本来はquotePrefix=True→シングルクオート勝手につくがしたいが
                 # なぜかそれだとうまく動作せず、quotePrefixそのままだとシングルクオートが二重につく
                 # quotePrefix=Falseにするとなぜか正しく動く
@@ -247,15 +309,6 @@ def spread_formula_symbol(
 
 
 def spread_formula(book: WOpenpyxl, sheet_name: str):
-    def number_replacer(row_index: int):
-        def number_increment(matchobj):
-            place_holder = matchobj.group(1)[1:-1]
-            number_value = int(place_holder)
-            return str(number_value + row_index - START_ROW_IDX)
-
-        return number_increment
-
-    regex_string_number = "({[0-9]+})"
     template_sheet = book.get_sheet("template_temp")
     # templateの横幅取得
     max_cols = template_sheet.max_column
@@ -277,36 +330,19 @@ def spread_formula(book: WOpenpyxl, sheet_name: str):
             logger.info(f"c={c}")
             # logger.info(f"template_value: {template_value}")
             max_rows = book.max_rows()
+            formula_template = FormulaTemplate(template_value, START_ROW_IDX)
             for r in range(START_ROW_IDX, max_rows + 1):
-                result = re.sub(regex_string_number, number_replacer(r), template_value)
+                result = formula_template.render(r)
                 book.set_value(r, c, result)
                 # logger.info(result)
 
 
 def spread_cell_format(book: WOpenpyxl, sheet_name: str):
-    target_column_idx = {
-        11: "0.000000",  # K
-        12: "0.000000",  # L
-        13: "0.000000",  # M
-        14: "0.000000",  # N
-        15: "0.000000",  # O
-        16: "0.000000",  # P
-        17: "0.000000",  # Q
-        19: "0.000000",  # S
-        21: "0.000000",  # U
-        22: "0.000000",  # V
-        24: "0.000000",  # X
-        25: "0.00",  # Y
-        26: "0.00",  # Z
-        27: "0.00",  # AA
-        28: "0.00",  # AB
-        29: "0.00",  # AC
-    }
     book.set_active_sheet(sheet_name)
     max_rows = book.max_rows()
 
     for r in range(START_ROW_IDX, max_rows + 1):
-        for key, value in target_column_idx.items():
+        for key, value in CELL_NUMBER_FORMATS.items():
             book.active_sheet.cell(r, key).number_format = value
 
 
@@ -323,19 +359,21 @@ def get_elapsed_time(basis_time: float):
 
 
 def bundle_transaction_groups(records: List[AbstractRecord]):
+    """txhashごとにレコードをまとめて時刻順のTransactionGroupにする
+    グループ内のレコードは読み込んだ順、同じ時刻のグループはtxhash順
+    """
+    records_by_txhash: Dict[str, List[AbstractRecord]] = dict()
+    for record in records:
+        records_by_txhash.setdefault(record.txhash, []).append(record)
+
     groups: List[TransactionGroup] = list()
-    records.sort(key=lambda x: x.txhash)
-    for key, group_by_txhash in groupby(records, key=lambda x: x.txhash):
-        records_by_txhash = list(group_by_txhash)
-        # logger.info(f"key: {key}, count: {len(records_by_txhash)}")
-        # for record_by_txhash in records_by_txhash:
-        #     logger.info(record_by_txhash)
+    for records_by_hash in records_by_txhash.values():
         group = TransactionGroup()
-        group.add_records(records_by_txhash)
+        group.add_records(records_by_hash)
         group.calc()
         groups.append(group)
 
-    groups.sort(key=lambda x: int(x.unix_timestamp))
+    groups.sort(key=lambda x: (int(x.unix_timestamp), x.txhash))
     return groups
 
 
@@ -368,18 +406,197 @@ def get_symbol_extend_position(
                 return col.col_idx + 1
 
 
-def output_processed_records(
-    address: str, records_map_list: List[TransationRecordsMap]
+def get_symbol_columns(
+    header: List[Optional[str]], symbols: List[str], pos_extend: int
+) -> Tuple[int, List[str]]:
+    """
+    attach_symbolsと同じ規則で、シンボルを追加し始める列と追加するシンボルを返す
+    header: テンプレートの1行目の値
+    """
+    symbols = list(symbols)
+    start_col = 0
+    for i, value in enumerate(header[(pos_extend - 1) :]):
+        # すでに値がある場合は残して、シンボル一覧から削除
+        if value != "":
+            value = value.replace("(amt)", "").replace("(ave)", "")
+            if value in symbols:
+                symbols.remove(value)
+            # シンボル開始位置更新
+            start_col = (pos_extend + i) + 1
+    return start_col, symbols
+
+
+def get_formula_templates(
+    template_row: Dict[int, str], start_symbol_col_idx: int, end_symbol_col_idx: int
+) -> Dict[int, str]:
+    """
+    spread_formula_symbolと同じ規則で、列番号ごとの数式のテンプレートを返す
+    template_row: テンプレートのSTART_ROW_IDX行目の列番号と値
+    """
+    formulas: Dict[int, str] = dict()
+    for c, value in template_row.items():
+        value = value.replace("'", "") if isinstance(value, str) else ""
+        if value.startswith("="):
+            formulas[c] = value
+
+    count_symbols = int((end_symbol_col_idx - start_symbol_col_idx - 1) / 2)
+    for c in range(start_symbol_col_idx, start_symbol_col_idx + 2):
+        template_value = formulas.get(c)
+        if template_value is None:
+            continue
+        formula_template = FormulaTemplate(template_value, START_ROW_IDX)
+        for count in range(0, count_symbols + 1):
+            formulas[c + (count * 2)] = formula_template.render(column_shift=count * 2)
+    return dict(sorted(formulas.items()))
+
+
+class DataRowBuilder:
+    """
+    データ行に数式と表示形式を付けて、書き出す行を1回で組み立てる
+    数式のテンプレートはあらかじめ解析しておく
+    """
+
+    def __init__(
+        self,
+        book: WriteOnlyWOpenpyxl,
+        formulas: Dict[int, str],
+        number_formats: Dict[int, str],
+        max_row: int,
+        calculator: Optional[HistoryCalculator] = None,
+    ):
+        # 計算した値を出力する列は数式を書かない
+        self.calculator = calculator
+        calculated_columns = calculator.columns if calculator is not None else set()
+        self.formulas = {
+            col: FormulaTemplate(template_value, START_ROW_IDX)
+            for col, template_value in formulas.items()
+            if col not in calculated_columns
+        }
+        # 共有数式にできる列は、先頭の行だけに数式を書いて残りの行はそれを参照する
+        self.shared_formulas = dict()
+        for col, formula_template in self.formulas.items():
+            shared = book.make_shared_formula(
+                col,
+                START_ROW_IDX,
+                max_row,
+                formula_template.render(START_ROW_IDX),
+                formula_template.render(max_row),
+            )
+            if shared is not None:
+                self.shared_formulas[col] = shared
+        # 書き込み専用のシートは追加した行をすぐに書き出すので、列ごとのセルを使い回す
+        self.cells = {
+            col: book.make_cell(None, book.make_style(number_format))
+            for col, number_format in number_formats.items()
+        }
+        self.width = max(list(formulas.keys()) + list(self.cells.keys()))
+
+    def build(self, data_row: List, row_index: int) -> List:
+        values = list(data_row)
+        values.extend([None] * (self.width - len(values)))
+        if self.calculator is not None:
+            self.calculator.calc(values)
+        for col, formula_template in self.formulas.items():
+            shared = self.shared_formulas.get(col)
+            if shared is None:
+                values[col - 1] = formula_template.render(row_index)
+            else:
+                values[col - 1] = shared[0] if row_index == START_ROW_IDX else shared[1]
+        for col, cell in self.cells.items():
+            cell.value = values[col - 1]
+            values[col - 1] = cell
+        return values
+
+
+def write_processed_network(
+    book: WriteOnlyWOpenpyxl, processed: ProcessedNetwork, pos_extend: int
+):
+    """
+    テンプレートのtemplateシートを元にネットワークのシートを行ごとに書き出す
+    出力内容はテンプレートを編集するoutput_processed_recordsと同じ
+    """
+    template_sheet = book.get_template_sheet("template")
+    header_rows = [
+        list(row) for row in book.iter_template_rows("template", 1, START_ROW_IDX - 1)
+    ]
+    header = [cell.value if cell is not None else None for cell in header_rows[0]]
+    start_col, symbols = get_symbol_columns(header, processed["symbols"], pos_extend)
+    end_symbol_col_idx = start_col + len(symbols) * 2
+
+    # 1行目にシンボル、2行目に初期値を追加する
+    for i, symbol in enumerate(symbols):
+        for col, suffix in (
+            (start_col + i * 2, "(amt)"),
+            (start_col + i * 2 + 1, "(ave)"),
+        ):
+            for row_values, value in (
+                (header_rows[0], symbol + suffix),
+                (header_rows[1], 0),
+            ):
+                row_values.extend([None] * (col - len(row_values)))
+                if row_values[col - 1] is None:
+                    row_values[col - 1] = book.make_cell(value)
+                else:
+                    row_values[col - 1].value = value
+
+    template_row = {
+        cell.column: cell.value for cell in template_sheet[START_ROW_IDX] if cell.value
+    }
+    formulas = get_formula_templates(template_row, pos_extend, end_symbol_col_idx)
+    calculator = None
+    if not OUTPUT_FORMULA:
+        calculator = HistoryCalculator(
+            [cell.value if cell is not None else None for cell in header_rows[0]],
+            [cell.value if cell is not None else None for cell in header_rows[1]],
+            formulas,
+            START_ROW_IDX,
+        )
+    max_row = START_ROW_IDX + len(processed["data_rows"]) - 1
+    row_builder = DataRowBuilder(
+        book, formulas, CELL_NUMBER_FORMATS, max_row, calculator
+    )
+
+    book.create_sheet(processed["network"]["name"], "template")
+    book.append(header_rows)
+    book.append(
+        row_builder.build(data_row, START_ROW_IDX + i)
+        for i, data_row in enumerate(processed["data_rows"])
+    )
+
+
+def output_processed_records_write_only(
+    address: str, processed_list: List[ProcessedNetwork]
 ):
-    book = WOpenpyxl("./template.xlsx")
+    """output_processed_recordsを書き込み専用のbookで行ごとに書き出す版"""
+    book = WriteOnlyWOpenpyxl("./template.xlsx", shared_formula=OUTPUT_SHARED_FORMULA)
     file_name = f'{BASIS_DATE.strftime("%Y%m%d%H%M%S")}-{address}.xlsx'
     logger.info(f"output {file_name}")
-    for records_map in records_map_list:
-        network = records_map["network"]
-        records = records_map["records"]
+    header = [cell.value for cell in book.get_template_sheet("template")[1]]
+    pos_extend = header.index("private_note") + 2
+
+    for sheet_name in book.template_sheet_names:
+        book.copy_sheet(sheet_name)
+    for processed in processed_list:
+        logger.info(f"sheet_name: {processed['network']['name']}")
+        write_processed_network(book, processed, pos_extend)
+        logger.info(
+            f"end write_processed_network({processed['network']['name']}): {get_elapsed_time(BASIS_PERF_COUNTER)}"
+        )
+
+    book.save_as("./output/" + file_name)
 
-        groups: List[TransactionGroup] = bundle_transaction_groups(records)
-        data_rows: List[List[str]] = convert_group_to_csv_data(groups)
+
+def output_processed_records(address: str, processed_list: List[ProcessedNetwork]):
+    if OUTPUT_WRITE_ONLY:
+        output_processed_records_write_only(address, processed_list)
+        return
+
+    book = WOpenpyxl("./template.xlsx")
+    file_name = f'{BASIS_DATE.strftime("%Y%m%d%H%M%S")}-{address}.xlsx'
+    logger.info(f"output {file_name}")
+    for processed in processed_list:
+        network = processed["network"]
+        data_rows = processed["data_rows"]
 
         sheet_name = network["name"]
         logger.info(f"sheet_name: {sheet_name}")
@@ -391,7 +608,7 @@ def output_processed_records(
         book.delete_rows(START_ROW_IDX)
         book.append(data_rows)
 
-        symbols = get_used_symbols(groups)
+        symbols = processed["symbols"]
         end_symbol_col_idx = attach_symbols(book, sheet_name, symbols, pos_extend)
         logger.info(
             f"end attach_symbols({sheet_name}): {get_elapsed_time(BASIS_PERF_COUNTER)}"
@@ -417,7 +634,63 @@ def output_processed_records(
     book.save_as("./output/" + file_name)
 
 
-def process_transaction_records():
+def limit_memory(memory_limit_mb: Optional[int]):
+    """ワーカープロセスの仮想メモリの上限を設定する
+    超えた場合はワーカー内でMemoryErrorになり、そのアドレスは失敗として扱う
+    """
+    if memory_limit_mb is None:
+        return
+    import resource
+
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def process_address(
+    address: str, network_workers: Optional[int] = None
+) -> AddressResult:
+    """1つのアドレスのxlsxを出力する、例外は結果に入れて返す"""
+    basis_time = time.perf_counter()
+    logger.info(f"process {address}")
+    error = None
+    try:
+        processed_list = process_networks(address, network_workers)
+        output_processed_records(address, processed_list)
+    except Exception as e:
+        logger.exception(f"{address}: failed")
+        error = repr(e)
+    return {
+        "address": address,
+        "ok": error is None,
+        "elapsed": get_elapsed_time(basis_time),
+        "error": error,
+    }
+
+
+def log_summary(results: List[AddressResult]) -> bool:
+    """アドレスごとの結果を出力する、失敗がなければTrueを返す"""
+    logger.info("summary:")
+    for result in results:
+        status = "ok" if result["ok"] else f'failed {result["error"]}'
+        logger.info(f'{result["address"]}: {result["elapsed"]} {status}')
+    failures = [result for result in results if not result["ok"]]
+    logger.info(f"{len(results) - len(failures)} ok, {len(failures)} failed")
+    return len(failures) == 0
+
+
+def process_transaction_records(
+    max_workers: Optional[int] = None, memory_limit_mb: Optional[int] = None
+) -> List[AddressResult]:
+    """./data以下のアドレスごとにxlsxを出力する
+    max_workersが2以上の場合はアドレスごとに別プロセスで処理する
+    その場合ネットワークは各プロセスの中で順番に処理する
+    """
+    if max_workers is None:
+        max_workers = ADDRESS_WORKERS
+    if memory_limit_mb is None:
+        memory_limit_mb = MEMORY_LIMIT_MB
+
+    results: List[AddressResult] = list()
     # ./data
     if os.path.exists(PATH_DATA):
         logger.info(f"check {PATH_DATA}")
@@ -430,23 +703,55 @@ def process_transaction_records():
             and not os.path.join(PATH_DATA, f).endswith(".bak")
         ]
 
-        for address in address_directories:
-            logger.info(f"process {address}")
-            records_map_list = collect_transaction_records_for_networks(address)
-            output_processed_records(address, records_map_list)
+        max_workers = min(max_workers, len(address_directories))
+        if max_workers <= 1:
+            for address in address_directories:
+                results.append(process_address(address))
+        else:
+            # ワーカーでレートを読み直さないように先に読み込んでおく
+            get_rate_index()
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=limit_memory,
+                initargs=(memory_limit_mb,),
+            ) as executor:
+                futures = {
+                    executor.submit(process_address, address, 1): address
+                    for address in address_directories
+                }
+                for future in as_completed(futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        # ワーカーのプロセスが落ちた場合など
+                        results.append(
+                            {
+                                "address": futures[future],
+                                "ok": False,
+                                "elapsed": "",
+                                "error": repr(e),
+                            }
+                        )
+            results.sort(
+                key=lambda result: address_directories.index(result["address"])
+            )
+
+    return results
 
 
-def main(args):
+def main(args) -> int:
+    """失敗したアドレスがある場合は1を返す"""
     logger.info(f"start run_make_history: {datetime.now()}")
 
-    process_transaction_records()
+    ok = log_summary(process_transaction_records())
 
     logger.info(f"end {datetime.now()}({get_elapsed_time(BASIS_PERF_COUNTER)})")
+    return 0 if ok else 1
 
 
 if __name__ == "__main__":
     args = sys.argv
     if 1 <= len(args):
-        main(args)
+        sys.exit(main(args))
     else:
         logger.info("Arguments are too short")
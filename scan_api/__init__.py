@@ -1,3 +1,4 @@
+import asyncio
 import csv  # noqa: E402
 import os
 from datetime import datetime
@@ -16,6 +17,7 @@ from util import api_base  # noqa: E402
 from util.logger import get_logger
 
 from . import blockscout, etherscan
+from .raw_store import RawStore
 from .types import SCAN_MAPPING, TYPE_SCANNAME, BlockScout, EtherScan, Scan
 from .util import is_blockscout, is_etherscan, wei_to_token, write_csv
 
@@ -28,14 +30,25 @@ def get_txlist(
     start_datetime: datetime,
     end_datetime: datetime,
     output_directory: str = "./output",
+    incremental: bool = False,
 ):
     if is_etherscan(scan):
         return etherscan.get_etherscan_txlist(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     elif is_blockscout(scan):
         return blockscout.get_blockscout_txlist(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     else:
         raise ValueError(f"Unsupported scan type: {type(scan)}")
@@ -47,14 +60,25 @@ def get_txlist_internal(
     start_datetime: datetime,
     end_datetime: datetime,
     output_directory: str = "./output",
+    incremental: bool = False,
 ):
     if is_etherscan(scan):
         return etherscan.get_etherscan_txlist_internal(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     elif is_blockscout(scan):
         return blockscout.get_blockscout_txlist_internal(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     else:
         raise ValueError(f"Unsupported scan type: {type(scan)}")
@@ -66,14 +90,25 @@ def get_txlist_token(
     start_datetime: datetime,
     end_datetime: datetime,
     output_directory: str = "./output",
+    incremental: bool = False,
 ):
     if is_etherscan(scan):
         return etherscan.get_etherscan_txlist_token(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     elif is_blockscout(scan):
         return blockscout.get_blockscout_txlist_token(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     else:
         raise ValueError(f"Unsupported scan type: {type(scan)}")
@@ -85,14 +120,25 @@ def get_txlist_tokennft(
     start_datetime: datetime,
     end_datetime: datetime,
     output_directory: str = "./output",
+    incremental: bool = False,
 ):
     if is_etherscan(scan):
         return etherscan.get_etherscan_txlist_tokennft(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     elif is_blockscout(scan):
         return blockscout.get_blockscout_txlist_tokennft(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     else:
         raise ValueError(f"Unsupported scan type: {type(scan)}")
@@ -104,14 +150,265 @@ def get_txlist_token1155(
     start_datetime: datetime,
     end_datetime: datetime,
     output_directory: str = "./output",
+    incremental: bool = False,
 ):
     if is_etherscan(scan):
         return etherscan.get_etherscan_txlist_token1155(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     elif is_blockscout(scan):
         return blockscout.get_blockscout_txlist_token1155(
-            scan, address, start_datetime, end_datetime, output_directory
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
         )
     else:
         raise ValueError(f"Unsupported scan type: {type(scan)}")
+
+
+async def get_txlist_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    if is_etherscan(scan):
+        return await etherscan.get_etherscan_txlist_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    elif is_blockscout(scan):
+        return await blockscout.get_blockscout_txlist_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    else:
+        raise ValueError(f"Unsupported scan type: {type(scan)}")
+
+
+async def get_txlist_internal_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    if is_etherscan(scan):
+        return await etherscan.get_etherscan_txlist_internal_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    elif is_blockscout(scan):
+        return await blockscout.get_blockscout_txlist_internal_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    else:
+        raise ValueError(f"Unsupported scan type: {type(scan)}")
+
+
+async def get_txlist_token_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    if is_etherscan(scan):
+        return await etherscan.get_etherscan_txlist_token_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    elif is_blockscout(scan):
+        return await blockscout.get_blockscout_txlist_token_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    else:
+        raise ValueError(f"Unsupported scan type: {type(scan)}")
+
+
+async def get_txlist_tokennft_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    if is_etherscan(scan):
+        return await etherscan.get_etherscan_txlist_tokennft_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    elif is_blockscout(scan):
+        return await blockscout.get_blockscout_txlist_tokennft_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    else:
+        raise ValueError(f"Unsupported scan type: {type(scan)}")
+
+
+async def get_txlist_token1155_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    if is_etherscan(scan):
+        return await etherscan.get_etherscan_txlist_token1155_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    elif is_blockscout(scan):
+        return await blockscout.get_blockscout_txlist_token1155_async(
+            client,
+            scan,
+            address,
+            start_datetime,
+            end_datetime,
+            output_directory,
+            incremental,
+        )
+    else:
+        raise ValueError(f"Unsupported scan type: {type(scan)}")
+
+
+async def get_scan_csv_async(
+    scans: List[Scan],
+    address: str,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    output_directory: str = "./output",
+    concurrency: int = api_base.DEFAULT_CONCURRENCY,
+    incremental: bool = False,
+) -> bool:
+    """全scanの全actionを同時に取得する
+    同時に投げるリクエスト数はconcurrencyで制限する
+    incremental=Trueの場合は前回取得したブロック以降だけを取得して既存のcsvにマージする
+    """
+    async with api_base.AsyncClient(concurrency) as client:
+        jobs = list()
+        for scan in scans:
+            actions = [
+                get_txlist_async,
+                get_txlist_internal_async,
+                get_txlist_token_async,
+                get_txlist_tokennft_async,
+            ]
+            if scan.has_erc1155:
+                actions.append(get_txlist_token1155_async)
+            for action in actions:
+                coroutine = action(
+                    client,
+                    scan,
+                    address,
+                    start_datetime,
+                    end_datetime,
+                    output_directory,
+                    incremental,
+                )
+                jobs.append((scan, action, coroutine))
+
+        results = await asyncio.gather(
+            *[coroutine for _, _, coroutine in jobs], return_exceptions=True
+        )
+
+    ret = True
+    for (scan, action, _), result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            logger.error(f"{scan.network} {action.__name__}: {result!r}")
+            ret = False
+        elif not result:
+            logger.info(f"{scan.network} {action.__name__}: failed")
+            ret = False
+    return ret
+
+
+def convert_raw(
+    scans: List[Scan],
+    address: str,
+    output_directory: str = "./output",
+):
+    """raw に保存した行から csv を作り直す
+    ネットワークには問い合わせない
+    """
+    for scan in scans:
+        if is_etherscan(scan):
+            write_functions = etherscan.WRITE_FUNCTIONS
+        elif is_blockscout(scan):
+            write_functions = blockscout.WRITE_FUNCTIONS
+        else:
+            raise ValueError(f"Unsupported scan type: {type(scan)}")
+
+        for filename, write_function in write_functions.items():
+            raw = RawStore(output_directory, address, scan, filename)
+            if not raw.exists():
+                logger.info(f"{raw.path}: not found")
+                continue
+            write_function(scan, address, raw.read(), output_directory)
@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from util.logger import get_logger
+
+from . import (
+    get_txlist,
+    get_txlist_internal,
+    get_txlist_token,
+    get_txlist_token1155,
+    get_txlist_tokennft,
+)
+from .types import SCAN_MAPPING, Scan
+
+logger = get_logger()
+
+DEFAULT_MAX_WORKERS = 8
+# タイムゾーンのない日時は JST とみなす
+DEFAULT_TIMEZONE = ZoneInfo("Asia/Tokyo")
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class Job:
+    """address x network x 期間 の取得1件"""
+
+    def __init__(
+        self,
+        address: str,
+        network: str,
+        start_datetime: Optional[datetime],
+        end_datetime: Optional[datetime],
+        window_directory: str = "",
+    ):
+        self.address = address
+        self.network = network
+        self.start_datetime = start_datetime
+        self.end_datetime = end_datetime
+        # 同じ address/network に複数の期間がある場合の期間ごとのサブディレクトリ
+        self.window_directory = window_directory
+
+    @property
+    def id(self) -> str:
+        return "/".join(
+            [
+                self.address,
+                self.network,
+                self.start_datetime.isoformat() if self.start_datetime else "",
+                self.end_datetime.isoformat() if self.end_datetime else "",
+            ]
+        )
+
+    @property
+    def scan(self) -> Scan:
+        return SCAN_MAPPING[self.network]
+
+    @property
+    def window(self) -> str:
+        """期間をファイル名に使える文字列にする"""
+        return "_".join(
+            [
+                dt.strftime("%Y%m%dT%H%M%S%z") if dt else "none"
+                for dt in [self.start_datetime, self.end_datetime]
+            ]
+        )
+
+    def output_directory(self, base: str) -> str:
+        """job の出力先、csv は更にその下の <address>/<network>/ に書かれる"""
+        if self.window_directory:
+            return "/".join([base, self.window_directory])
+        return base
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=DEFAULT_TIMEZONE)
+    return dt
+
+
+def load_manifest(path: str) -> dict:
+    """manifest を読み込んで jobs を Job に展開する
+
+    {
+        "output_directory": "./output",
+        "incremental": false,
+        "jobs": [
+            {
+                "addresses": ["0x..."],
+                "networks": ["ethereum", "polygon"],
+                "start": "2024-08-25T00:00:00+09:00",
+                "end": "2024-10-01T00:00:00+09:00"
+            }
+        ]
+    }
+    addresses/networks は address/network で1件だけ指定してもよい
+    start/end は省略すると期間を指定しない
+    同じ address/network に複数の期間がある場合は、互いに上書きしないよう
+    output_directory/<start>_<end>/<address>/<network>/ に期間ごとに出力する
+    """
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    jobs: List[Job] = list()
+    for entry in manifest["jobs"]:
+        addresses = entry.get("addresses") or [entry["address"]]
+        networks = entry.get("networks") or [entry["network"]]
+        for network in networks:
+            if network not in SCAN_MAPPING:
+                raise ValueError(f"Unsupported network: {network}")
+        for address in addresses:
+            for network in networks:
+                jobs.append(
+                    Job(
+                        address,
+                        network,
+                        parse_datetime(entry.get("start")),
+                        parse_datetime(entry.get("end")),
+                    )
+                )
+
+    # 同じ address/network の job が複数の期間を持つ場合は出力先を期間ごとに分ける
+    windows: Dict[tuple, set] = defaultdict(set)
+    for job in jobs:
+        windows[(job.address, job.network)].add(job.window)
+    for job in jobs:
+        if len(windows[(job.address, job.network)]) > 1:
+            job.window_directory = job.window
+
+    return {
+        "output_directory": manifest.get("output_directory", "./output"),
+        "incremental": manifest.get("incremental", False),
+        "jobs": jobs,
+    }
+
+
+class JobStatus:
+    """job ごとの結果を json に記録する
+    再実行時は done の job を飛ばせる
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._status: Dict[str, dict] = dict()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._status = json.load(f)
+
+    def is_done(self, job: Job) -> bool:
+        return self._status.get(job.id, {}).get("status") == STATUS_DONE
+
+    def update(self, job: Job, status: str, error: Optional[str] = None):
+        with self._lock:
+            self._status[job.id] = {
+                "address": job.address,
+                "network": job.network,
+                "status": status,
+                "error": error,
+                "updated": datetime.now(timezone.utc).isoformat(),
+            }
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._status, f, indent=2)
+            os.replace(temp_path, self.path)
+
+
+def run_job(job: Job, output_directory: str, incremental: bool) -> bool:
+    """1つの address/network の全 action を取得する"""
+    output_directory = job.output_directory(output_directory)
+    scan = job.scan
+    actions = [get_txlist, get_txlist_internal, get_txlist_token, get_txlist_tokennft]
+    if scan.has_erc1155:
+        actions.append(get_txlist_token1155)
+
+    ret = True
+    for action in actions:
+        ok = action(
+            scan,
+            job.address,
+            job.start_datetime,
+            job.end_datetime,
+            output_directory,
+            incremental,
+        )
+        if not ok:
+            logger.info(f"{job.id} {action.__name__}: failed")
+            ret = False
+    return ret
+
+
+def run_batch(
+    manifest_path: str,
+    status_path: Optional[str] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    retry: bool = False,
+) -> bool:
+    """manifest の job をスレッドプールで実行する
+
+    リクエストの間隔は Scan ごとの rate_limiter で全スレッド共通に制御される。
+    結果は status_path (省略時は manifest と同じ場所の *.status.json) に記録し、
+    retry=True の場合は done になっていない job だけを実行する。
+    """
+    manifest = load_manifest(manifest_path)
+    if status_path is None:
+        status_path = os.path.splitext(manifest_path)[0] + ".status.json"
+    status = JobStatus(status_path)
+
+    jobs: List[Job] = manifest["jobs"]
+    if retry:
+        jobs = [job for job in jobs if not status.is_done(job)]
+    logger.info(f"{len(jobs)} jobs")
+
+    # 同じ出力先の job は一時ファイルと csv を共有するので、同じスレッドで順番に実行する
+    groups: Dict[tuple, List[Job]] = defaultdict(list)
+    for job in jobs:
+        groups[(job.address, job.network, job.window_directory)].append(job)
+
+    def run_group(group: List[Job]) -> bool:
+        ret = True
+        for job in group:
+            try:
+                ok = run_job(job, manifest["output_directory"], manifest["incremental"])
+                error = None if ok else "incomplete result"
+            except Exception as e:
+                logger.error(f"{job.id}: {e!r}")
+                ok = False
+                error = repr(e)
+            status.update(job, STATUS_DONE if ok else STATUS_FAILED, error)
+            ret = ret and ok
+        return ret
+
+    ret = True
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_group, group) for group in groups.values()]
+        for future in as_completed(futures):
+            ret = future.result() and ret
+    return ret
@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from util.logger import get_logger
+from util.util import timestamp_fromdatetime
+
+logger = get_logger()
+
+DEFAULT_CACHE_PATH = "./cache/blockno.sqlite3"
+# 直近の時刻はまだブロックが確定していない可能性があるのでキャッシュしない
+STABLE_SECONDS = 10 * 60
+
+TYPE_CACHE_KEY = Tuple[str, int, str]
+
+
+class BlocknoCache:
+    """getblocknobytime の結果のキャッシュ
+
+    network + timestamp + closest をキーにして sqlite に保存する。
+    プロセス内ではメモリ上の dict を先に参照する。
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH):
+        self._path = path
+        self._lock = threading.Lock()
+        self._memo: Dict[TYPE_CACHE_KEY, str] = dict()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._path is None:
+            return None
+        if self._connection is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self._path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS blockno ("
+                " network TEXT NOT NULL,"
+                " timestamp INTEGER NOT NULL,"
+                " closest TEXT NOT NULL,"
+                " blockno TEXT NOT NULL,"
+                " PRIMARY KEY (network, timestamp, closest))"
+            )
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def make_key(network: str, timestamp: datetime, closest: str) -> TYPE_CACHE_KEY:
+        return (network, timestamp_fromdatetime(timestamp), closest)
+
+    def get(self, network: str, timestamp: datetime, closest: str) -> Optional[str]:
+        key = self.make_key(network, timestamp, closest)
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+            connection = self._connect()
+            if connection is None:
+                return None
+            row = connection.execute(
+                "SELECT blockno FROM blockno"
+                " WHERE network = ? AND timestamp = ? AND closest = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            self._memo[key] = row[0]
+            return row[0]
+
+    def set(self, network: str, timestamp: datetime, closest: str, blockno):
+        """ブロック番号として解釈できる確定済みの結果だけ保存する"""
+        if blockno is None or not str(blockno).isdigit():
+            return
+        key = self.make_key(network, timestamp, closest)
+        with self._lock:
+            self._memo[key] = blockno
+            if key[1] > time.time() - STABLE_SECONDS:
+                return
+            connection = self._connect()
+            if connection is None:
+                return
+            connection.execute(
+                "INSERT OR REPLACE INTO blockno VALUES (?, ?, ?, ?)",
+                (*key, str(blockno)),
+            )
+            connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_blockno_cache: Optional[BlocknoCache] = None
+_blockno_cache_lock = threading.Lock()
+
+
+def get_blockno_cache() -> BlocknoCache:
+    """プロセスで共有する BlocknoCache を取得"""
+    global _blockno_cache
+    with _blockno_cache_lock:
+        if _blockno_cache is None:
+            _blockno_cache = BlocknoCache()
+        return _blockno_cache
+
+
+def configure_blockno_cache(path: Optional[str] = DEFAULT_CACHE_PATH):
+    """キャッシュの保存先を変更する、None の場合はメモリ上のみ"""
+    global _blockno_cache
+    with _blockno_cache_lock:
+        if _blockno_cache is not None:
+            _blockno_cache.close()
+        _blockno_cache = BlocknoCache(path)
@@ -1,8 +1,10 @@
-import pprint  # noqa: E402
+import asyncio
 from datetime import datetime, timezone  # noqa: E402
 from decimal import Decimal  # noqa: E402
 from typing import (  # noqa: E402
     Dict,
+    Iterable,
+    Iterator,
     List,
     Literal,
     MutableSet,
@@ -15,8 +17,17 @@ from util import api_base  # noqa: E402
 from util.logger import get_logger
 from util.util import timestamp_fromdatetime  # noqa: E402
 
+from ..blockno_cache import get_blockno_cache
+from ..pagination import make_txlist_paginator, make_txlist_paginator_async
+from ..sync import IncrementalSync
 from ..types import Scan
-from ..util import wei_to_token, write_csv
+from ..util import (
+    consume_in_thread,
+    iter_write_csv,
+    pprint_first,
+    wei_to_token,
+    write_csv,
+)
 
 logger = get_logger()
 
@@ -30,8 +41,12 @@ class GetBlocknoBlockScoutApi(api_base.APIBase):
        &closest=before
     """
 
+    closest = "before"
+
     def __init__(self, scan: Scan):
+        self._network = scan.network
         self._url = scan.url
+        self.rate_limiter = scan.rate_limiter
         # self._key = scan.key
 
     def get_url_with_params(self, **kwargs):
@@ -39,7 +54,7 @@ class GetBlocknoBlockScoutApi(api_base.APIBase):
             module="block",
             action="getblocknobytime",
             timestamp=timestamp_fromdatetime(kwargs.get("timestamp")),
-            closest="before",
+            closest=self.closest,
             # apikey=self._key,
         )
         url = self.make_url(self._url, d)
@@ -58,7 +73,22 @@ class GetBlocknoBlockScoutApi(api_base.APIBase):
         :return: blockno
         :rtype: int
         """
-        return super().execute(**kwargs)
+        cache = get_blockno_cache()
+        timestamp = kwargs.get("timestamp")
+        blockno = cache.get(self._network, timestamp, self.closest)
+        if blockno is None:
+            blockno = super().execute(**kwargs)
+            cache.set(self._network, timestamp, self.closest, blockno)
+        return blockno
+
+    async def execute_async(self, client: api_base.AsyncClient, **kwargs) -> int:
+        cache = get_blockno_cache()
+        timestamp = kwargs.get("timestamp")
+        blockno = cache.get(self._network, timestamp, self.closest)
+        if blockno is None:
+            blockno = await super().execute_async(client, **kwargs)
+            cache.set(self._network, timestamp, self.closest, blockno)
+        return blockno
 
 
 class GetTxlistBlockScoutApi(api_base.APIBase):
@@ -66,6 +96,7 @@ class GetTxlistBlockScoutApi(api_base.APIBase):
     def __init__(self, scan: Scan):
         self._scan = scan
         self._url = scan.url
+        self.rate_limiter = scan.rate_limiter
         # self._key = scan["key"]
 
     def get_url_with_params(self, **kwargs):
@@ -106,6 +137,8 @@ class GetTxlistBlockScoutApi(api_base.APIBase):
         :param str address: address
         :param int start_block: start_block
         :param int end_block: end_block
+        :param int page: page
+        :param int offset: offset
         :return: result
         :rtype: Any
         """
@@ -118,71 +151,67 @@ def get_blockscout_txlist(
     start_datetime: Optional[datetime],
     end_datetime: Optional[datetime],
     output_directory: str = "./output",
+    incremental: bool = False,
 ):
-    ret = True
-
-    output_directory_network = "/".join([output_directory, address, scan.network])
-
-    get_blockno_api = GetBlocknoBlockScoutApi(scan)
-    get_txlist_api = GetTxlistBlockScoutApi(scan)
-
-    startblockno = None
-    if start_datetime:
-        startblockno = get_blockno_api.execute(
-            timestamp=start_datetime.astimezone(timezone.utc)
-        )
-
-    endblockno = None
-    if end_datetime:
-        endblockno = get_blockno_api.execute(
-            timestamp=end_datetime.astimezone(timezone.utc)
-        )
-
-    result: List[dict] = get_txlist_api.execute(
-        action="txlist",
-        address=address,
-        startblock=startblockno,
-        endblock=endblockno,
+    sync = IncrementalSync(output_directory, address, scan, "txlist.csv", incremental)
+    paginator = make_txlist_paginator(
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "txlist",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
     )
+    sync.write(
+        write_blockscout_txlist,
+        scan,
+        address,
+        paginator,
+        output_directory,
+        is_complete=lambda: paginator.ok,
+    )
+    return paginator.ok
 
-    if result is None:
-        ret = False
-        result = []
-    if len(result) > 0:
-        pprint.pprint(result[0])
-
-    field_names = [
-        "blockHash",
-        "blockNumber",
-        "confirmations",
-        "contractAddress",
-        "cumulativeGasUsed",
-        "from",
-        "gas",
-        "gasPrice",
-        "gasUsed",
-        "hash",
-        "isError",
-        "nonce",
-        "timeStamp",
-        "to",
-        "transactionIndex",
-        "txreceipt_status",
-        "value",
-    ]
 
-    ignore_list = ["input", "gasPriceBid"]
-    write_csv(
-        "/".join([output_directory_network, "source"]),
-        "txlist.csv",
-        field_names,
-        result,
-        ignore_list,
+async def get_blockscout_txlist_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: Optional[datetime],
+    end_datetime: Optional[datetime],
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    sync = IncrementalSync(output_directory, address, scan, "txlist.csv", incremental)
+    paginator = await make_txlist_paginator_async(
+        client,
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "txlist",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
+    )
+    await consume_in_thread(
+        paginator,
+        lambda rows: sync.write(
+            write_blockscout_txlist,
+            scan,
+            address,
+            rows,
+            output_directory,
+            is_complete=lambda: paginator.ok,
+        ),
     )
+    return paginator.ok
 
-    # convert
-    data = list()
-    for row in result:
+
+def convert_blockscout_txlist(
+    scan: Scan, address: str, rows: Iterable[dict]
+) -> Iterator[dict]:
+    for row in rows:
         new_row = dict()
         new_row["Txhash"] = row["hash"]
         new_row["Blockno"] = row["blockNumber"]
@@ -227,7 +256,50 @@ def get_blockscout_txlist(
         new_row["Method"] = ""
         new_row["PrivateNote"] = ""
 
-        data.append(new_row)
+        yield new_row
+
+
+def write_blockscout_txlist(
+    scan: Scan,
+    address: str,
+    result: Iterable[dict],
+    output_directory: str,
+):
+    output_directory_network = "/".join([output_directory, address, scan.network])
+
+    rows = pprint_first(result)
+
+    field_names = [
+        "blockHash",
+        "blockNumber",
+        "confirmations",
+        "contractAddress",
+        "cumulativeGasUsed",
+        "from",
+        "gas",
+        "gasPrice",
+        "gasUsed",
+        "hash",
+        "isError",
+        "nonce",
+        "timeStamp",
+        "to",
+        "transactionIndex",
+        "txreceipt_status",
+        "value",
+    ]
+
+    ignore_list = ["input", "gasPriceBid"]
+    rows = iter_write_csv(
+        "/".join([output_directory_network, "source"]),
+        "txlist.csv",
+        field_names,
+        rows,
+        ignore_list,
+    )
+
+    # convert
+    data = convert_blockscout_txlist(scan, address, rows)
 
     field_names = [
         "Txhash",
@@ -256,8 +328,6 @@ def get_blockscout_txlist(
         data,
     )
 
-    return ret
-
 
 def get_blockscout_txlist_internal(
     scan: Scan,
@@ -265,68 +335,71 @@ def get_blockscout_txlist_internal(
     start_datetime: Optional[datetime],
     end_datetime: Optional[datetime],
     output_directory: str,
+    incremental: bool = False,
 ):
-    ret = True
-
-    output_directory_network = "/".join([output_directory, address, scan.network])
-
-    get_blockno_api = GetBlocknoBlockScoutApi(scan)
-    get_txlist_api = GetTxlistBlockScoutApi(scan)
-
-    startblockno = None
-    if start_datetime:
-        startblockno = get_blockno_api.execute(
-            timestamp=start_datetime.astimezone(timezone.utc)
-        )
-
-    endblockno = None
-    if end_datetime:
-        endblockno = get_blockno_api.execute(
-            timestamp=end_datetime.astimezone(timezone.utc)
-        )
-
-    result = get_txlist_api.execute(
-        action="txlistinternal",
-        address=address,
-        startblock=startblockno,
-        endblock=endblockno,
+    sync = IncrementalSync(
+        output_directory, address, scan, "txlist_internal.csv", incremental
+    )
+    paginator = make_txlist_paginator(
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "txlistinternal",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
     )
+    sync.write(
+        write_blockscout_txlist_internal,
+        scan,
+        address,
+        paginator,
+        output_directory,
+        is_complete=lambda: paginator.ok,
+    )
+    return paginator.ok
 
-    if result is None:
-        ret = False
-        result = []
-    if len(result) > 0:
-        pprint.pprint(result[0])
 
-    field_names = [
-        "blockNumber",
-        "callType",
-        "contractAddress",
-        "errCode",
-        "from",
-        "gas",
-        "gasUsed",
-        "index",
-        "isError",
-        "timeStamp",
-        "to",
-        "transactionHash",
-        "type",
-        "value",
-    ]
-
-    ignore_list = ["input"]
-    write_csv(
-        "/".join([output_directory_network, "source"]),
-        "txlist_internal.csv",
-        field_names,
-        result,
-        ignore_list,
+async def get_blockscout_txlist_internal_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: Optional[datetime],
+    end_datetime: Optional[datetime],
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    sync = IncrementalSync(
+        output_directory, address, scan, "txlist_internal.csv", incremental
+    )
+    paginator = await make_txlist_paginator_async(
+        client,
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "txlistinternal",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
     )
+    await consume_in_thread(
+        paginator,
+        lambda rows: sync.write(
+            write_blockscout_txlist_internal,
+            scan,
+            address,
+            rows,
+            output_directory,
+            is_complete=lambda: paginator.ok,
+        ),
+    )
+    return paginator.ok
 
-    # convert
-    data = list()
-    for row in result:
+
+def convert_blockscout_txlist_internal(
+    scan: Scan, address: str, rows: Iterable[dict]
+) -> Iterator[dict]:
+    for row in rows:
         new_row = dict()
         new_row["Txhash"] = row["transactionHash"]
         new_row["Blockno"] = row["blockNumber"]
@@ -370,7 +443,47 @@ def get_blockscout_txlist_internal(
         new_row["Type"] = row["type"]
         new_row["PrivateNote"] = ""
 
-        data.append(new_row)
+        yield new_row
+
+
+def write_blockscout_txlist_internal(
+    scan: Scan,
+    address: str,
+    result: Iterable[dict],
+    output_directory: str,
+):
+    output_directory_network = "/".join([output_directory, address, scan.network])
+
+    rows = pprint_first(result)
+
+    field_names = [
+        "blockNumber",
+        "callType",
+        "contractAddress",
+        "errCode",
+        "from",
+        "gas",
+        "gasUsed",
+        "index",
+        "isError",
+        "timeStamp",
+        "to",
+        "transactionHash",
+        "type",
+        "value",
+    ]
+
+    ignore_list = ["input"]
+    rows = iter_write_csv(
+        "/".join([output_directory_network, "source"]),
+        "txlist_internal.csv",
+        field_names,
+        rows,
+        ignore_list,
+    )
+
+    # convert
+    data = convert_blockscout_txlist_internal(scan, address, rows)
 
     field_names = [
         "Txhash",
@@ -399,8 +512,6 @@ def get_blockscout_txlist_internal(
         data,
     )
 
-    return ret
-
 
 def get_blockscout_txlist_token(
     scan: Scan,
@@ -408,47 +519,112 @@ def get_blockscout_txlist_token(
     start_datetime: Optional[datetime],
     end_datetime: Optional[datetime],
     output_directory: str,
+    incremental: bool = False,
 ):
-    ret = True
-
-    output_directory_network = "/".join([output_directory, address, scan.network])
-
-    get_blockno_api = GetBlocknoBlockScoutApi(scan)
-    get_txlist_api = GetTxlistBlockScoutApi(scan)
-
-    startblockno = None
-    if start_datetime:
-        startblockno = get_blockno_api.execute(
-            timestamp=start_datetime.astimezone(timezone.utc)
-        )
+    sync = IncrementalSync(
+        output_directory, address, scan, "txlist_token.csv", incremental
+    )
+    paginator = make_txlist_paginator(
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "tokentx",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
+    )
+    sync.write(
+        write_blockscout_txlist_token,
+        scan,
+        address,
+        paginator,
+        output_directory,
+        is_complete=lambda: paginator.ok,
+    )
+    return paginator.ok
 
-    endblockno = None
-    if end_datetime:
-        endblockno = get_blockno_api.execute(
-            timestamp=end_datetime.astimezone(timezone.utc)
-        )
 
-    result = get_txlist_api.execute(
-        action="tokentx",
-        address=address,
-        startblock=startblockno,
-        endblock=endblockno,
+async def get_blockscout_txlist_token_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: Optional[datetime],
+    end_datetime: Optional[datetime],
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    sync = IncrementalSync(
+        output_directory, address, scan, "txlist_token.csv", incremental
     )
+    paginator = await make_txlist_paginator_async(
+        client,
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "tokentx",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
+    )
+    await consume_in_thread(
+        paginator,
+        lambda rows: sync.write(
+            write_blockscout_txlist_token,
+            scan,
+            address,
+            rows,
+            output_directory,
+            is_complete=lambda: paginator.ok,
+        ),
+    )
+    return paginator.ok
 
-    if result is None:
-        ret = False
-        result = []
 
-    rows = []
+def filter_blockscout_txlist_token(result: Iterable[dict]) -> Iterator[dict]:
     for row in result:
         if not ("value" in row):
             logger.info("not value in row")
             # pprint.pprint(row)
             continue
-        rows.append(row)
+        yield row
 
-    if len(rows) > 0:
-        pprint.pprint(rows[0])
+
+def convert_blockscout_txlist_token(
+    scan: Scan, address: str, rows: Iterable[dict]
+) -> Iterator[dict]:
+    for row in rows:
+        new_row = dict()
+        new_row["Txhash"] = row["hash"]
+        new_row["Blockno"] = row["blockNumber"]
+        new_row["UnixTimestamp"] = row["timeStamp"]
+        timestamp_dt = datetime.fromtimestamp(float(row["timeStamp"]), timezone.utc)
+        new_row["DateTime (UTC)"] = timestamp_dt.strftime("%Y-%m-%d %H:%M:%S")
+        new_row["From"] = row["from"]
+        new_row["To"] = row["to"]
+        new_row["TokenValue"] = str(
+            wei_to_token(
+                row["value"],
+                Decimal(row["tokenDecimal"]),
+            )
+        )
+        new_row["USDValueDayOfTx"] = ""
+        new_row["ContractAddress"] = row["contractAddress"]
+        new_row["TokenName"] = row["tokenName"]
+        new_row["TokenSymbol"] = row["tokenSymbol"]
+        new_row["PrivateNote"] = ""
+
+        yield new_row
+
+
+def write_blockscout_txlist_token(
+    scan: Scan,
+    address: str,
+    result: Iterable[dict],
+    output_directory: str,
+):
+    output_directory_network = "/".join([output_directory, address, scan.network])
+
+    rows = pprint_first(filter_blockscout_txlist_token(result))
 
     field_names = [
         "blockHash",
@@ -473,7 +649,7 @@ def get_blockscout_txlist_token(
     ]
 
     ignore_list = ["input"]
-    write_csv(
+    rows = iter_write_csv(
         "/".join([output_directory_network, "source"]),
         "txlist_token.csv",
         field_names,
@@ -482,29 +658,7 @@ def get_blockscout_txlist_token(
     )
 
     # convert
-    data = list()
-    for row in rows:
-        new_row = dict()
-        new_row["Txhash"] = row["hash"]
-        new_row["Blockno"] = row["blockNumber"]
-        new_row["UnixTimestamp"] = row["timeStamp"]
-        timestamp_dt = datetime.fromtimestamp(float(row["timeStamp"]), timezone.utc)
-        new_row["DateTime (UTC)"] = timestamp_dt.strftime("%Y-%m-%d %H:%M:%S")
-        new_row["From"] = row["from"]
-        new_row["To"] = row["to"]
-        new_row["TokenValue"] = str(
-            wei_to_token(
-                row["value"],
-                Decimal(row["tokenDecimal"]),
-            )
-        )
-        new_row["USDValueDayOfTx"] = ""
-        new_row["ContractAddress"] = row["contractAddress"]
-        new_row["TokenName"] = row["tokenName"]
-        new_row["TokenSymbol"] = row["tokenSymbol"]
-        new_row["PrivateNote"] = ""
-
-        data.append(new_row)
+    data = convert_blockscout_txlist_token(scan, address, rows)
 
     field_names = [
         "Txhash",
@@ -528,8 +682,6 @@ def get_blockscout_txlist_token(
         data,
     )
 
-    return ret
-
 
 def get_blockscout_txlist_tokennft(
     scan: Scan,
@@ -537,47 +689,106 @@ def get_blockscout_txlist_tokennft(
     start_datetime: Optional[datetime],
     end_datetime: Optional[datetime],
     output_directory: str,
+    incremental: bool = False,
 ):
-    ret = True
-
-    output_directory_network = "/".join([output_directory, address, scan.network])
-
-    get_blockno_api = GetBlocknoBlockScoutApi(scan)
-    get_txlist_api = GetTxlistBlockScoutApi(scan)
-
-    startblockno = None
-    if start_datetime:
-        startblockno = get_blockno_api.execute(
-            timestamp=start_datetime.astimezone(timezone.utc)
-        )
+    sync = IncrementalSync(
+        output_directory, address, scan, "txlist_tokennft.csv", incremental
+    )
+    paginator = make_txlist_paginator(
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "tokentx",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
+    )
+    sync.write(
+        write_blockscout_txlist_tokennft,
+        scan,
+        address,
+        paginator,
+        output_directory,
+        is_complete=lambda: paginator.ok,
+    )
+    return paginator.ok
 
-    endblockno = None
-    if end_datetime:
-        endblockno = get_blockno_api.execute(
-            timestamp=end_datetime.astimezone(timezone.utc)
-        )
 
-    result = get_txlist_api.execute(
-        action="tokentx",
-        address=address,
-        startblock=startblockno,
-        endblock=endblockno,
+async def get_blockscout_txlist_tokennft_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: Optional[datetime],
+    end_datetime: Optional[datetime],
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    sync = IncrementalSync(
+        output_directory, address, scan, "txlist_tokennft.csv", incremental
+    )
+    paginator = await make_txlist_paginator_async(
+        client,
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "tokentx",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
     )
+    await consume_in_thread(
+        paginator,
+        lambda rows: sync.write(
+            write_blockscout_txlist_tokennft,
+            scan,
+            address,
+            rows,
+            output_directory,
+            is_complete=lambda: paginator.ok,
+        ),
+    )
+    return paginator.ok
 
-    if result is None:
-        ret = False
-        result = []
 
-    rows = []
+def filter_blockscout_txlist_tokennft(result: Iterable[dict]) -> Iterator[dict]:
     for row in result:
         if not ("tokenID" in row and row["tokenName"] is not None):
             logger.info("not tokenID in row")
             # pprint.pprint(row)
             continue
-        rows.append(row)
+        yield row
+
+
+def convert_blockscout_txlist_tokennft(
+    scan: Scan, address: str, rows: Iterable[dict]
+) -> Iterator[dict]:
+    for row in rows:
+        new_row = dict()
+        new_row["Txhash"] = row["hash"]
+        new_row["Blockno"] = row["blockNumber"]
+        new_row["UnixTimestamp"] = row["timeStamp"]
+        timestamp_dt = datetime.fromtimestamp(float(row["timeStamp"]), timezone.utc)
+        new_row["DateTime (UTC)"] = timestamp_dt.strftime("%Y-%m-%d %H:%M:%S")
+        new_row["From"] = row["from"]
+        new_row["To"] = row["to"]
+        new_row["ContractAddress"] = row["contractAddress"]
+        new_row["TokenId"] = row["tokenID"]
+        new_row["TokenName"] = row["tokenName"]
+        new_row["TokenSymbol"] = row["tokenSymbol"]
+        new_row["PrivateNote"] = ""
+
+        yield new_row
+
+
+def write_blockscout_txlist_tokennft(
+    scan: Scan,
+    address: str,
+    result: Iterable[dict],
+    output_directory: str,
+):
+    output_directory_network = "/".join([output_directory, address, scan.network])
 
-    if len(rows) > 0:
-        pprint.pprint(rows[0])
+    rows = pprint_first(filter_blockscout_txlist_tokennft(result))
 
     field_names = [
         "blockHash",
@@ -601,7 +812,7 @@ def get_blockscout_txlist_tokennft(
         "tokenID",
     ]
     ignore_list = ["input"]
-    write_csv(
+    rows = iter_write_csv(
         "/".join([output_directory_network, "source"]),
         "txlist_tokennft.csv",
         field_names,
@@ -610,23 +821,7 @@ def get_blockscout_txlist_tokennft(
     )
 
     # convert
-    data = list()
-    for row in rows:
-        new_row = dict()
-        new_row["Txhash"] = row["hash"]
-        new_row["Blockno"] = row["blockNumber"]
-        new_row["UnixTimestamp"] = row["timeStamp"]
-        timestamp_dt = datetime.fromtimestamp(float(row["timeStamp"]), timezone.utc)
-        new_row["DateTime (UTC)"] = timestamp_dt.strftime("%Y-%m-%d %H:%M:%S")
-        new_row["From"] = row["from"]
-        new_row["To"] = row["to"]
-        new_row["ContractAddress"] = row["contractAddress"]
-        new_row["TokenId"] = row["tokenID"]
-        new_row["TokenName"] = row["tokenName"]
-        new_row["TokenSymbol"] = row["tokenSymbol"]
-        new_row["PrivateNote"] = ""
-
-        data.append(new_row)
+    data = convert_blockscout_txlist_tokennft(scan, address, rows)
 
     field_names = [
         "Txhash",
@@ -648,8 +843,6 @@ def get_blockscout_txlist_tokennft(
         data,
     )
 
-    return ret
-
 
 def get_blockscout_txlist_token1155(
     scan: Scan,
@@ -657,47 +850,106 @@ def get_blockscout_txlist_token1155(
     start_datetime: Optional[datetime],
     end_datetime: Optional[datetime],
     output_directory: str,
+    incremental: bool = False,
 ):
-    ret = True
-
-    output_directory_network = "/".join([output_directory, address, scan.network])
-
-    get_blockno_api = GetBlocknoBlockScoutApi(scan)
-    get_txlist_api = GetTxlistBlockScoutApi(scan)
-
-    startblockno = None
-    if start_datetime:
-        startblockno = get_blockno_api.execute(
-            timestamp=start_datetime.astimezone(timezone.utc)
-        )
+    sync = IncrementalSync(
+        output_directory, address, scan, "txlist_token1155.csv", incremental
+    )
+    paginator = make_txlist_paginator(
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "tokentx",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
+    )
+    sync.write(
+        write_blockscout_txlist_token1155,
+        scan,
+        address,
+        paginator,
+        output_directory,
+        is_complete=lambda: paginator.ok,
+    )
+    return paginator.ok
 
-    endblockno = None
-    if end_datetime:
-        endblockno = get_blockno_api.execute(
-            timestamp=end_datetime.astimezone(timezone.utc)
-        )
 
-    result = get_txlist_api.execute(
-        action="tokentx",
-        address=address,
-        startblock=startblockno,
-        endblock=endblockno,
+async def get_blockscout_txlist_token1155_async(
+    client: api_base.AsyncClient,
+    scan: Scan,
+    address: str,
+    start_datetime: Optional[datetime],
+    end_datetime: Optional[datetime],
+    output_directory: str = "./output",
+    incremental: bool = False,
+):
+    sync = IncrementalSync(
+        output_directory, address, scan, "txlist_token1155.csv", incremental
+    )
+    paginator = await make_txlist_paginator_async(
+        client,
+        GetBlocknoBlockScoutApi(scan),
+        GetTxlistBlockScoutApi(scan),
+        "tokentx",
+        address,
+        start_datetime,
+        end_datetime,
+        startblock=sync.startblock,
     )
+    await consume_in_thread(
+        paginator,
+        lambda rows: sync.write(
+            write_blockscout_txlist_token1155,
+            scan,
+            address,
+            rows,
+            output_directory,
+            is_complete=lambda: paginator.ok,
+        ),
+    )
+    return paginator.ok
 
-    if result is None:
-        ret = False
-        result = []
 
-    rows = []
-    for row in rows:
+def filter_blockscout_txlist_token1155(result: Iterable[dict]) -> Iterator[dict]:
+    for row in result:
         if not ("tokenID" in row and row["tokenName"] is None):
             logger.info("not tokenID in row")
             # pprint.pprint(row)
             continue
-        rows.append(row)
+        yield row
 
-    if len(rows) > 0:
-        pprint.pprint(rows[0])
+
+def convert_blockscout_txlist_token1155(
+    scan: Scan, address: str, rows: Iterable[dict]
+) -> Iterator[dict]:
+    for row in rows:
+        new_row = dict()
+        new_row["Txhash"] = row["hash"]
+        new_row["Blockno"] = row["blockNumber"]
+        new_row["UnixTimestamp"] = row["timeStamp"]
+        timestamp_dt = datetime.fromtimestamp(float(row["timeStamp"]), timezone.utc)
+        new_row["DateTime (UTC)"] = timestamp_dt.strftime("%Y-%m-%d %H:%M:%S")
+        new_row["From"] = row["from"]
+        new_row["To"] = row["to"]
+        new_row["ContractAddress"] = row["contractAddress"]
+        new_row["TokenId"] = row["tokenID"]
+        new_row["TokenName"] = row["tokenName"]
+        new_row["TokenSymbol"] = row["tokenSymbol"]
+        new_row["PrivateNote"] = ""
+
+        yield new_row
+
+
+def write_blockscout_txlist_token1155(
+    scan: Scan,
+    address: str,
+    result: Iterable[dict],
+    output_directory: str,
+):
+    output_directory_network = "/".join([output_directory, address, scan.network])
+
+    rows = pprint_first(filter_blockscout_txlist_token1155(result))
 
     field_names = [
         "blockHash",
@@ -722,7 +974,7 @@ def get_blockscout_txlist_token1155(
     ]
 
     ignore_list = ["input"]
-    write_csv(
+    rows = iter_write_csv(
         "/".join([output_directory_network, "source"]),
         "txlist_token1155.csv",
         field_names,
@@ -731,23 +983,7 @@ def get_blockscout_txlist_token1155(
     )
 
     # convert
-    data = list()
-    for row in rows:
-        new_row = dict()
-        new_row["Txhash"] = row["hash"]
-        new_row["Blockno"] = row["blockNumber"]
-        new_row["UnixTimestamp"] = row["timeStamp"]
-        timestamp_dt = datetime.fromtimestamp(float(row["timeStamp"]), timezone.utc)
-        new_row["DateTime (UTC)"] = timestamp_dt.strftime("%Y-%m-%d %H:%M:%S")
-        new_row["From"] = row["from"]
-        new_row["To"] = row["to"]
-        new_row["ContractAddress"] = row["contractAddress"]
-        new_row["TokenId"] = row["tokenID"]
-        new_row["TokenName"] = row["tokenName"]
-        new_row["TokenSymbol"] = row["tokenSymbol"]
-        new_row["PrivateNote"] = ""
-
-        data.append(new_row)
+    data = convert_blockscout_txlist_token1155(scan, address, rows)
 
     field_names = [
         "Txhash",
@@ -769,4 +1005,13 @@ def get_blockscout_txlist_token1155(
         field_names,
         data,
     )
-    return ret
+
+
+# source の csv 名ごとの書き出し関数、raw からの再変換に使う
+WRITE_FUNCTIONS = {
+    "txlist.csv": write_blockscout_txlist,
+    "txlist_internal.csv": write_blockscout_txlist_internal,
+    "txlist_token.csv": write_blockscout_txlist_token,
+    "txlist_tokennft.csv": write_blockscout_txlist_tokennft,
+    "txlist_token1155.csv": write_blockscout_txlist_token1155,
+}
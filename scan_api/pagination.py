@@ -0,0 +1,232 @@
+from datetime import datetime, timezone  # noqa: E402
+from typing import AsyncIterator, Iterator, Optional, Set  # noqa: E402
+
+from util import api_base  # noqa: E402
+from util.logger import get_logger
+
+from .util import row_key
+
+logger = get_logger()
+
+DEFAULT_PAGE_SIZE = 1000
+# etherscan/blockscout ともに page * offset が 10000 件を超える問い合わせはエラーになる
+RESULT_WINDOW = 10000
+
+
+class TxlistPaginator:
+    """TxlistPaginator
+
+    page/offset でページを辿りながら結果を 1 行ずつ返す。
+    結果ウィンドウ(page * offset <= RESULT_WINDOW)を使い切った場合は
+    最後に取得したブロックを startblock にして続きを取得する。
+    境界ブロックで取得済みの行は読み飛ばす。
+
+    取得に失敗した場合は ok が False になる。
+    stream=True の場合はレスポンスを読みながら1行ずつデコードする。
+    """
+
+    def __init__(
+        self,
+        api: api_base.APIBase,
+        action: str,
+        address: str,
+        startblock: Optional[int] = None,
+        endblock: Optional[int] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        stream: bool = False,
+    ):
+        self._api = api
+        self._action = action
+        self._address = address
+        self._startblock = startblock
+        self._endblock = endblock
+        self._page_size = page_size
+        self._max_page = max(1, RESULT_WINDOW // page_size)
+        self._stream = stream
+
+        self.ok = True
+        self.count = 0
+
+    def __iter__(self) -> Iterator[dict]:
+        state = PageState(self._startblock, self._page_size, self._max_page)
+        while not state.done:
+            params = self.make_params(state)
+            if self._stream:
+                result = self._api.execute_stream(**params)
+            else:
+                result = self._api.execute(**params)
+            for row in state.consume(result):
+                self.count = self.count + 1
+                yield row
+        self.ok = state.ok
+
+    def make_params(self, state: "PageState") -> dict:
+        return dict(
+            action=self._action,
+            address=self._address,
+            startblock=state.startblock,
+            endblock=self._endblock,
+            page=state.page,
+            offset=self._page_size,
+        )
+
+
+class AsyncTxlistPaginator(TxlistPaginator):
+    """TxlistPaginatorのasyncio版"""
+
+    def __init__(self, client: api_base.AsyncClient, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = client
+
+    async def __aiter__(self) -> AsyncIterator[dict]:
+        state = PageState(self._startblock, self._page_size, self._max_page)
+        while not state.done:
+            result = await self._api.execute_async(
+                self._client, **self.make_params(state)
+            )
+            for row in state.consume(result):
+                self.count = self.count + 1
+                yield row
+        self.ok = state.ok
+
+
+def make_txlist_paginator(
+    get_blockno_api: api_base.APIBase,
+    get_txlist_api: api_base.APIBase,
+    action: str,
+    address: str,
+    start_datetime: Optional[datetime],
+    end_datetime: Optional[datetime],
+    startblock: Optional[int] = None,
+    **kwargs,
+) -> TxlistPaginator:
+    # startblock の指定がある場合は start_datetime より優先する
+    startblockno = startblock
+    if startblockno is None and start_datetime:
+        startblockno = get_blockno_api.execute(
+            timestamp=start_datetime.astimezone(timezone.utc)
+        )
+
+    endblockno = None
+    if end_datetime:
+        endblockno = get_blockno_api.execute(
+            timestamp=end_datetime.astimezone(timezone.utc)
+        )
+
+    return TxlistPaginator(
+        get_txlist_api,
+        action=action,
+        address=address,
+        startblock=startblockno,
+        endblock=endblockno,
+        **kwargs,
+    )
+
+
+async def make_txlist_paginator_async(
+    client: api_base.AsyncClient,
+    get_blockno_api: api_base.APIBase,
+    get_txlist_api: api_base.APIBase,
+    action: str,
+    address: str,
+    start_datetime: Optional[datetime],
+    end_datetime: Optional[datetime],
+    startblock: Optional[int] = None,
+    **kwargs,
+) -> AsyncTxlistPaginator:
+    # startblock の指定がある場合は start_datetime より優先する
+    startblockno = startblock
+    if startblockno is None and start_datetime:
+        startblockno = await get_blockno_api.execute_async(
+            client, timestamp=start_datetime.astimezone(timezone.utc)
+        )
+
+    endblockno = None
+    if end_datetime:
+        endblockno = await get_blockno_api.execute_async(
+            client, timestamp=end_datetime.astimezone(timezone.utc)
+        )
+
+    return AsyncTxlistPaginator(
+        client,
+        get_txlist_api,
+        action=action,
+        address=address,
+        startblock=startblockno,
+        endblock=endblockno,
+        **kwargs,
+    )
+
+
+class PageState:
+    """ページ送りの状態"""
+
+    def __init__(self, startblock: Optional[int], page_size: int, max_page: int):
+        self.startblock = startblock
+        self.page = 1
+        self.done = False
+        self.ok = True
+
+        self._page_size = page_size
+        self._max_page = max_page
+
+        # 直前のウィンドウで取得済みの境界ブロックの行
+        self._skip_block: Optional[int] = None
+        self._skip_keys: Set[tuple] = set()
+        # 現在のウィンドウの先頭ブロックと最終ブロックの行
+        self._first_block: Optional[int] = None
+        self._last_block: Optional[int] = None
+        self._last_keys: Set[tuple] = set()
+
+    def consume(self, result) -> Iterator[dict]:
+        if not isinstance(result, (list, api_base.JsonResultStream)):
+            self.fail(result)
+            return
+
+        count = 0
+        last_row = None
+        for row in result:
+            count = count + 1
+            last_row = row
+            blockno = int(row["blockNumber"])
+            if self._first_block is None:
+                self._first_block = blockno
+            key = row_key(row)
+            if blockno == self._skip_block and key in self._skip_keys:
+                continue
+            if blockno != self._last_block:
+                self._last_block = blockno
+                self._last_keys = set()
+            self._last_keys.add(key)
+            yield row
+
+        if isinstance(result, api_base.JsonResultStream) and not result.is_array:
+            self.fail(result.response)
+        elif count < self._page_size:
+            self.done = True
+        elif self.page < self._max_page:
+            self.page = self.page + 1
+        else:
+            self.next_window(int(last_row["blockNumber"]))
+
+    def fail(self, result):
+        logger.info(f"unexpected result: {result}")
+        self.ok = False
+        self.done = True
+
+    def next_window(self, last_block: int):
+        if last_block == self._first_block:
+            # 1ブロックでウィンドウを使い切っているのでこれ以上進めない
+            logger.info(f"result window exhausted at block {last_block}")
+            self.ok = False
+            self.done = True
+            return
+
+        logger.info(f"result window exhausted, restart from block {last_block}")
+        self.startblock = last_block
+        self.page = 1
+        self._skip_block = self._last_block
+        self._skip_keys = self._last_keys
+        self._first_block = None
+        self._last_block = None
+        self._last_keys = set()
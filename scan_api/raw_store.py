@@ -0,0 +1,98 @@
+import gzip
+import json
+import os
+from typing import IO, Iterable, Iterator, Optional
+
+from util.logger import get_logger
+
+from .types import Scan
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+logger = get_logger()
+
+RAW_DIRECTORY = "raw"
+COMPRESSIONS = ["zst", "gz"]
+# zstandard がインストールされていない場合は gzip で保存する
+DEFAULT_COMPRESSION = "zst" if zstandard is not None else "gz"
+
+
+class RawStore:
+    """RawStore
+
+    explorer の result の行を加工せずに
+    output/<address>/<network>/raw/<source の csv 名>.ndjson.(zst|gz) に保存する。
+    source の csv で落としている列(input など)も残るので、
+    csv への変換はネットワークに問い合わせずにやり直せる。
+    """
+
+    def __init__(
+        self,
+        output_directory: str,
+        address: str,
+        scan: Scan,
+        filename: str,
+        compression: Optional[str] = None,
+    ):
+        self._directory = "/".join(
+            [output_directory, address, scan.network, RAW_DIRECTORY]
+        )
+        self._name = os.path.splitext(filename)[0] + ".ndjson"
+        if compression is None:
+            # 既存のファイルがあればその形式を使う
+            compression = next(
+                (c for c in COMPRESSIONS if os.path.exists(self._make_path(c))),
+                DEFAULT_COMPRESSION,
+            )
+        if compression == "zst" and zstandard is None:
+            raise ValueError("zstandard is not installed")
+        self.compression = compression
+
+    def _make_path(self, compression: str) -> str:
+        return "/".join([self._directory, f"{self._name}.{compression}"])
+
+    @property
+    def path(self) -> str:
+        return self._make_path(self.compression)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _open(self, path: str, mode: str) -> IO[str]:
+        if self.compression == "zst":
+            return zstandard.open(path, mode, encoding="utf-8")
+        return gzip.open(path, mode, encoding="utf-8")
+
+    def capture(self, rows: Iterable[dict]) -> Iterator[dict]:
+        """行を1行ずつ書き出しながらそのまま返す
+        最後まで読まれるまでは一時ファイルに書く
+        """
+        os.makedirs(self._directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        count = 0
+        try:
+            with self._open(temp_path, "wt") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False))
+                    f.write("\n")
+                    count = count + 1
+                    yield row
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.replace(temp_path, self.path)
+        logger.info(f"{self.path}: {count} rows")
+
+    def write(self, rows: Iterable[dict]):
+        for _ in self.capture(rows):
+            pass
+
+    def read(self) -> Iterator[dict]:
+        with self._open(self.path, "rt") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,195 @@
+import csv
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from util.logger import get_logger
+
+from .raw_store import RawStore
+from .types import Scan
+from .util import VOLATILE_FIELDS, row_key
+
+logger = get_logger()
+
+SYNC_STATE_FILENAME = "sync_state.json"
+
+# 同じネットワークの action を並行して保存するので読み書きをまとめてロックする
+_sync_state_lock = threading.Lock()
+
+
+class IncrementalSync:
+    """IncrementalSync
+
+    output/<address>/<network>/sync_state.json に source の csv ごとの
+    取得済みの最大 blockNumber を記録し、次回はそのブロックから取得する。
+    取得した行は既存の raw (なければ source の csv)の行とマージする。
+    同じ行かどうかは保存している列(confirmations を除く)で判定するので
+    hash/logIndex/traceId など行を特定する列が一致する行は重複しない。
+
+    enabled でなくても取得した行は raw に保存する。その場合 raw は今回取得した範囲の
+    行だけになって次回の続きにできないので、sync_state.json の記録は消す。
+    取得が途中で終わった場合は記録を進めず、次回も前回のブロックから取得する。
+    """
+
+    def __init__(
+        self,
+        output_directory: str,
+        address: str,
+        scan: Scan,
+        filename: str,
+        enabled: bool = True,
+    ):
+        self._directory = "/".join([output_directory, address, scan.network])
+        self._filename = filename
+        self.enabled = enabled
+        self.raw = RawStore(output_directory, address, scan, filename)
+
+    @property
+    def state_path(self) -> str:
+        return "/".join([self._directory, SYNC_STATE_FILENAME])
+
+    @property
+    def source_path(self) -> str:
+        return "/".join([self._directory, "source", self._filename])
+
+    def _load_state(self) -> Dict[str, int]:
+        if not os.path.exists(self.state_path):
+            return dict()
+        with open(self.state_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def startblock(self) -> Optional[int]:
+        """前回の最終ブロック、境界ブロックの行は merge で重複を除く"""
+        if not self.enabled:
+            return None
+        with _sync_state_lock:
+            return self._load_state().get(self._filename)
+
+    def _load_rows(self) -> Tuple[List[dict], Callable[[dict], tuple]]:
+        """既存の行と行の同一性を判定するキー関数を返す
+        raw があればそちらを優先する
+        """
+        if self.raw.exists():
+            return list(self.raw.read()), row_key
+        if not os.path.exists(self.source_path):
+            return list(), row_key
+
+        with open(self.source_path, encoding="utf-8", newline="") as csvfile:
+            reader = csv.DictReader(csvfile)
+            key_fields = [
+                field
+                for field in reader.fieldnames or []
+                if field not in VOLATILE_FIELDS
+            ]
+            rows = list(reader)
+
+        def make_key(row: dict) -> tuple:
+            return tuple(
+                "" if row.get(field) is None else str(row.get(field))
+                for field in key_fields
+            )
+
+        return rows, make_key
+
+    def merge(self, result: Iterable[dict]) -> Iterator[dict]:
+        """既存の行の後ろに新しい行を追加する
+
+        raw があって前回の最終ブロックから取得している場合は既存の行に続けて
+        新しい行を返すだけなので、重複判定に保持するのは境界ブロックの行だけになる。
+        それ以外は全件を読み込んで blockNumber 順に並べる。
+        """
+        if not self.enabled:
+            yield from result
+            return
+
+        startblock = self.startblock
+        if startblock is not None and self.raw.exists():
+            keys = set()
+            for row in self.raw.read():
+                if int(row["blockNumber"]) >= startblock:
+                    keys.add(row_key(row))
+                yield row
+            added = 0
+            for row in result:
+                if row_key(row) in keys:
+                    continue
+                added = added + 1
+                yield row
+            logger.info(f"{self.raw.path}: {added} rows added")
+            return
+
+        rows, make_key = self._load_rows()
+        if len(rows) == 0:
+            yield from result
+            return
+
+        keys = set(make_key(row) for row in rows)
+        added = 0
+        for row in result:
+            key = make_key(row)
+            if key in keys:
+                continue
+            keys.add(key)
+            rows.append(row)
+            added = added + 1
+        logger.info(f"{self.source_path}: {added} rows added")
+
+        rows.sort(key=lambda row: int(row["blockNumber"]))
+        yield from rows
+
+    def save(self, blockno: Optional[int]):
+        """取得済みの最大 blockNumber を記録する"""
+        if not self.enabled or blockno is None:
+            return
+        with _sync_state_lock:
+            state = self._load_state()
+            if state.get(self._filename, -1) >= blockno:
+                return
+            state[self._filename] = blockno
+            os.makedirs(self._directory, exist_ok=True)
+            with open(self.state_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+
+    def clear(self):
+        """記録を消す、次回は全件を取得して既存の行とマージする"""
+        with _sync_state_lock:
+            state = self._load_state()
+            if self._filename not in state:
+                return
+            del state[self._filename]
+            with open(self.state_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+
+    def write(
+        self,
+        write_function: Callable,
+        scan: Scan,
+        address: str,
+        result: Iterable[dict],
+        output_directory: str,
+        is_complete: Callable[[], bool] = lambda: True,
+    ):
+        """merge した行を raw に保存しながら write_function で書き出し、状態を記録する
+        is_complete は書き出した後に呼び、False の場合は状態を進めない
+        """
+        blockno: Optional[int] = None
+
+        def track(rows: Iterable[dict]) -> Iterator[dict]:
+            nonlocal blockno
+            for row in rows:
+                blockno = max(int(row["blockNumber"]), blockno or 0)
+                yield row
+
+        write_function(
+            scan, address, track(self.raw.capture(self.merge(result))), output_directory
+        )
+        if not self.enabled:
+            self.clear()
+        elif is_complete():
+            self.save(blockno)
+        else:
+            logger.info(
+                f"{self.raw.path}: incomplete result, {SYNC_STATE_FILENAME} not updated"
+            )
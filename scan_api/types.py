@@ -8,6 +8,8 @@ from typing import (  # noqa: E402
     TypeGuard,
 )
 
+from util.rate_limiter import DEFAULT_BURST, DEFAULT_RPS, RateLimiter, get_rate_limiter
+
 TYPE_SCANNAME = Literal[
     "ethereum",
     "polygon",
@@ -33,6 +35,8 @@ class Scan:
         token: str,
         decimals: int,
         has_erc1155: bool = False,
+        rps: float = DEFAULT_RPS,
+        burst: int = DEFAULT_BURST,
     ):
         self.name = name
         self.network = network
@@ -41,6 +45,13 @@ class Scan:
         self.token = token
         self.decimals = decimals
         self.has_erc1155 = has_erc1155
+        self.rps = rps
+        self.burst = burst
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """同じurlとkeyのScanで共有するRateLimiter"""
+        return get_rate_limiter((self.url, self.key), self.rps, self.burst)
 
 
 class EtherScan(Scan):
@@ -58,8 +69,12 @@ class BlockScout(Scan):
         decimals: int,
         api_version: int,
         has_erc1155: bool = False,
+        rps: float = DEFAULT_RPS,
+        burst: int = DEFAULT_BURST,
     ):
-        super().__init__(name, network, url, key, token, decimals, has_erc1155)
+        super().__init__(
+            name, network, url, key, token, decimals, has_erc1155, rps, burst
+        )
         self.api_version = api_version
 
 
@@ -1,14 +1,23 @@
+import asyncio
 import csv  # noqa: E402
 import os
+import pprint
+import queue
+import threading
 from decimal import Decimal  # noqa: E402
 from typing import (  # noqa: E402
+    AsyncIterator,
+    Callable,
     Dict,
+    Iterable,
+    Iterator,
     List,
     Literal,
     MutableSet,
     NotRequired,
     TypedDict,
     TypeGuard,
+    TypeVar,
 )
 
 from util.logger import get_logger
@@ -17,32 +26,129 @@ from .types import BlockScout, EtherScan, Scan
 
 logger = get_logger()
 
+T = TypeVar("T")
+
+# csv のファイルバッファ、行はこの単位でまとめて書き出す
+WRITE_BUFFER_SIZE = 1024 * 1024
+# asyncio から別スレッドの書き出しに渡すときに溜める行数の上限
+QUEUE_SIZE = 1000
+
+# 問い合わせのたびに変化するので行の同一性判定には使わない
+VOLATILE_FIELDS = ["confirmations"]
+
 
 def wei_to_token(wei, decimals):
     return Decimal(wei) / Decimal(10**decimals)
 
 
-def write_csv(
+def row_key(row: dict) -> tuple:
+    return tuple(
+        (key, str(value))
+        for key, value in sorted(row.items())
+        if key not in VOLATILE_FIELDS
+    )
+
+
+def iter_write_csv(
     directory: str,
     filename: str,
     field_names: List[str],
-    data: List[dict],
+    data: Iterable[dict],
     ignore_list: List[str] = [],
-):
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+) -> Iterator[dict]:
+    """data を1行ずつ書き出しながらそのまま返す
+    最後まで書き終えるまでは一時ファイルに書くので途中で失敗しても既存の csv は残る
+    """
+    os.makedirs(directory, exist_ok=True)
 
     file_path = "/".join([directory, filename])
+    temp_path = file_path + ".tmp"
     logger.info(file_path)
-    with open(file_path, "w", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(
-            csvfile, fieldnames=field_names, strict=True, quoting=csv.QUOTE_ALL
-        )
-        writer.writeheader()
-        for row in data:
-            for ignore in ignore_list:
-                row.pop(ignore, None)
-            writer.writerow(row)
+    try:
+        with open(
+            temp_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE
+        ) as csvfile:
+            writer = csv.DictWriter(
+                csvfile, fieldnames=field_names, strict=True, quoting=csv.QUOTE_ALL
+            )
+            writer.writeheader()
+            for row in data:
+                for ignore in ignore_list:
+                    row.pop(ignore, None)
+                writer.writerow(row)
+                yield row
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, file_path)
+
+
+def write_csv(
+    directory: str,
+    filename: str,
+    field_names: List[str],
+    data: Iterable[dict],
+    ignore_list: List[str] = [],
+):
+    for _ in iter_write_csv(directory, filename, field_names, data, ignore_list):
+        pass
+
+
+def pprint_first(data: Iterable[dict]) -> Iterator[dict]:
+    """先頭の行を表示しながら data をそのまま返す"""
+    for i, row in enumerate(data):
+        if i == 0:
+            pprint.pprint(row)
+        yield row
+
+
+async def consume_in_thread(
+    data: AsyncIterator[dict],
+    consume: Callable[[Iterator[dict]], T],
+    maxsize: int = QUEUE_SIZE,
+) -> T:
+    """async の行を別スレッドの consume に渡す
+    溜める行数を maxsize までにして全件をメモリに載せない
+    data の途中で例外になった場合は consume も中断させる
+    """
+    rows: queue.Queue = queue.Queue(maxsize)
+    end = object()
+    aborted = threading.Event()
+
+    def iterate() -> Iterator[dict]:
+        while True:
+            try:
+                row = rows.get(timeout=0.1)
+            except queue.Empty:
+                row = None
+            if aborted.is_set():
+                raise RuntimeError("aborted")
+            if row is end:
+                return
+            if row is not None:
+                yield row
+
+    task = asyncio.ensure_future(asyncio.to_thread(consume, iterate()))
+
+    async def put(row):
+        while not task.done():
+            try:
+                rows.put_nowait(row)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.01)
+
+    try:
+        async for row in data:
+            await put(row)
+            if task.done():
+                break
+    except BaseException:
+        aborted.set()
+        raise
+    await put(end)
+    return await task
 
 
 def is_etherscan(scan: Scan) -> TypeGuard[EtherScan]:
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest  # noqa: E402
+
+from util import api_base  # noqa: E402
+from util.rate_limiter import RateLimiter  # noqa: E402
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = json.dumps(
+            {"status": "1", "message": "OK", "result": [{"path": self.path}]}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HtmlHandler(BaseHTTPRequestHandler):
+    """HTMLで包まれたJSONを返す"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        result = json.dumps({"status": "1", "result": [{"path": self.path}]})
+        body = f"<html><body>{result}</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThrottleHandler(BaseHTTPRequestHandler):
+    """429 -> レート制限の応答 -> 正常 の順に返す"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.calls = self.server.calls + 1
+        if self.server.calls == 1:
+            status = 429
+            body = {"status": "0", "message": "NOTOK", "result": None}
+        elif self.server.calls == 2:
+            status = 200
+            body = {
+                "status": "0",
+                "message": "NOTOK",
+                "result": "Max rate limit reached",
+            }
+        else:
+            status = 200
+            body = {"status": "1", "message": "OK", "result": [{"path": self.path}]}
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EchoApi(api_base.APIBase):
+    def __init__(self, url):
+        self._url = url
+
+    def get_url_with_params(self, **kwargs):
+        return self.make_url(self._url, self.make_query_dict(**kwargs))
+
+    def parse(self, response):
+        return response["result"]
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JsonHandler)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    api_base.close_sessions()
+
+
+@pytest.fixture
+def throttle_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottleHandler)
+    server.calls = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    api_base.close_sessions()
+
+
+def test_execute_reuses_connection(server):
+    url = f"http://127.0.0.1:{server.server_port}/api"
+    api = EchoApi(url)
+    for page in range(1, 4):
+        assert api.execute(page=page) == [{"path": f"/api?page={page}"}]
+    assert len(server.connections) == 1
+    assert api_base.get_session(url) is api_base.get_session(url + "?x=1")
+
+
+def test_decode_response_html_fallback():
+    content = b'<html><body>{"status": "1", "result": [1, 2]}</body></html>'
+    assert api_base.decode_response(content) == {"status": "1", "result": [1, 2]}
+
+
+def test_json_result_stream():
+    body = json.dumps(
+        {
+            "status": "1",
+            "message": "OK",
+            "result": [{"blockNumber": "1", "hash": "0xあ"}, {"value": 12345}],
+        },
+        ensure_ascii=False,
+    ).encode()
+    chunks = [body[i : i + 3] for i in range(0, len(body), 3)]
+    stream = api_base.JsonResultStream(chunks)
+    assert list(stream) == [{"blockNumber": "1", "hash": "0xあ"}, {"value": 12345}]
+    assert stream.is_array
+    assert stream.response == {"status": "1", "message": "OK"}
+
+
+def test_json_result_stream_not_array():
+    body = b'{"status":"0","message":"NOTOK","result":"Max rate limit reached"}'
+    stream = api_base.JsonResultStream([body[:10], body[10:]])
+    assert list(stream) == []
+    assert not stream.is_array
+    assert stream.response["result"] == "Max rate limit reached"
+
+
+def test_execute_stream(server):
+    url = f"http://127.0.0.1:{server.server_port}/api"
+    stream = EchoApi(url).execute_stream(page=1)
+    assert list(stream) == [{"path": "/api?page=1"}]
+
+
+def test_execute_stream_html_fallback():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), HtmlHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/api"
+        assert EchoApi(url).execute_stream(page=1) == [{"path": "/api?page=1"}]
+    finally:
+        server.shutdown()
+        api_base.close_sessions()
+
+
+def test_is_throttled():
+    assert api_base.is_throttled({"result": "Max rate limit reached"})
+    assert api_base.is_throttled({"message": "NOTOK: Rate limit exceeded"})
+    assert not api_base.is_throttled({"result": []})
+    assert not api_base.is_throttled([])
+
+
+def test_execute_retries_when_throttled(throttle_server):
+    url = f"http://127.0.0.1:{throttle_server.server_port}/api"
+    api = EchoApi(url)
+    api.rate_limiter = RateLimiter(rps=100.0, backoff_base=0.01)
+    assert api.execute(page=1) == [{"path": "/api?page=1"}]
+    assert throttle_server.calls == 3
+
+
+def test_execute_without_rate_limiter_does_not_retry(throttle_server):
+    url = f"http://127.0.0.1:{throttle_server.server_port}/api"
+    with pytest.raises(Exception):
+        EchoApi(url).execute(page=1)
+    assert throttle_server.calls == 1
+
+
+def test_execute_stream_retries_when_throttled(throttle_server):
+    url = f"http://127.0.0.1:{throttle_server.server_port}/api"
+    api = EchoApi(url)
+    api.rate_limiter = RateLimiter(rps=100.0, backoff_base=0.01)
+    stream = api.execute_stream(page=1)
+    assert list(stream) == [{"path": "/api?page=1"}]
+    assert stream.is_array
+    assert stream.response == {"status": "1", "message": "OK"}
+    assert throttle_server.calls == 3
+
+
+def test_execute_async_retries_when_throttled(throttle_server):
+    url = f"http://127.0.0.1:{throttle_server.server_port}/api"
+    api = EchoApi(url)
+    api.rate_limiter = RateLimiter(rps=100.0, backoff_base=0.01)
+
+    async def run():
+        async with api_base.AsyncClient() as client:
+            return await api.execute_async(client, page=1)
+
+    assert asyncio.run(run()) == [{"path": "/api?page=1"}]
+    assert throttle_server.calls == 3
@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+
+from scan_api import batch
+
+
+def write_manifest(tmp_path, jobs):
+    path = tmp_path / "manifest.json"
+    path.write_text(
+        json.dumps({"output_directory": str(tmp_path / "output"), "jobs": jobs})
+    )
+    return str(path)
+
+
+def test_load_manifest(tmp_path):
+    path = write_manifest(
+        tmp_path,
+        [
+            {
+                "addresses": ["0xa", "0xb"],
+                "networks": ["ethereum", "polygon"],
+                "start": "2024-08-25T00:00:00",
+                "end": None,
+            },
+            {"address": "0xc", "network": "oasys"},
+        ],
+    )
+    manifest = batch.load_manifest(path)
+    jobs = manifest["jobs"]
+    assert [(job.address, job.network) for job in jobs] == [
+        ("0xa", "ethereum"),
+        ("0xa", "polygon"),
+        ("0xb", "ethereum"),
+        ("0xb", "polygon"),
+        ("0xc", "oasys"),
+    ]
+    assert jobs[0].id == "0xa/ethereum/2024-08-25T00:00:00+09:00/"
+    assert jobs[4].start_datetime is None
+    assert manifest["incremental"] is False
+
+
+def test_run_batch_retries_failed_jobs(tmp_path, monkeypatch):
+    path = write_manifest(
+        tmp_path, [{"addresses": ["0xa", "0xb", "0xc"], "network": "ethereum"}]
+    )
+    calls = list()
+
+    def run_job(job, output_directory, incremental):
+        calls.append(job.address)
+        if job.address == "0xb":
+            raise RuntimeError("rate limited")
+        return job.address != "0xc"
+
+    monkeypatch.setattr(batch, "run_job", run_job)
+    assert not batch.run_batch(path, max_workers=2)
+    assert sorted(calls) == ["0xa", "0xb", "0xc"]
+
+    with open(tmp_path / "manifest.status.json") as f:
+        status = json.load(f)
+    assert {value["address"]: value["status"] for value in status.values()} == {
+        "0xa": "done",
+        "0xb": "failed",
+        "0xc": "failed",
+    }
+
+    calls.clear()
+    assert not batch.run_batch(path, retry=True)
+    assert sorted(calls) == ["0xb", "0xc"]
+
+
+def test_load_manifest_splits_output_by_window(tmp_path):
+    path = write_manifest(
+        tmp_path,
+        [
+            {"address": "0xa", "network": "ethereum", "end": "2024-09-01T00:00:00"},
+            {"address": "0xa", "network": "ethereum", "start": "2024-09-01T00:00:00"},
+            {"address": "0xb", "network": "ethereum", "start": "2024-09-01T00:00:00"},
+        ],
+    )
+    jobs = batch.load_manifest(path)["jobs"]
+    assert [job.output_directory("out") for job in jobs] == [
+        "out/none_20240901T000000+0900",
+        "out/20240901T000000+0900_none",
+        "out",
+    ]
+
+
+def test_run_batch_runs_same_output_serially(tmp_path, monkeypatch):
+    path = write_manifest(
+        tmp_path,
+        [
+            {"address": "0xa", "network": "ethereum", "end": "2024-09-01T00:00:00"},
+            {"address": "0xa", "network": "ethereum", "start": "2024-09-01T00:00:00"},
+            {"address": "0xa", "network": "ethereum", "start": "2024-09-01T00:00:00"},
+        ],
+    )
+    lock = threading.Lock()
+    running = dict()
+    overlaps = list()
+
+    def run_job(job, output_directory, incremental):
+        directory = job.output_directory(output_directory)
+        with lock:
+            if running.get(directory):
+                overlaps.append(directory)
+            running[directory] = True
+        time.sleep(0.01)
+        with lock:
+            running[directory] = False
+        return True
+
+    monkeypatch.setattr(batch, "run_job", run_job)
+    assert batch.run_batch(path, max_workers=4)
+    assert overlaps == []
+    assert len(running) == 2
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+
+from scan_api import blockno_cache
+from scan_api.blockno_cache import BlocknoCache
+from scan_api.etherscan import GetBlocknoEtherscanApi
+from scan_api.types import SCAN_MAPPING
+
+TIMESTAMP = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def test_cache_persists(tmp_path):
+    path = str(tmp_path / "cache" / "blockno.sqlite3")
+    cache = BlocknoCache(path)
+    assert cache.get("ethereum", TIMESTAMP, "before") is None
+    cache.set("ethereum", TIMESTAMP, "before", "18908894")
+    cache.close()
+
+    cache = BlocknoCache(path)
+    assert cache.get("ethereum", TIMESTAMP, "before") == "18908894"
+    assert cache.get("polygon", TIMESTAMP, "before") is None
+    assert cache.get("ethereum", TIMESTAMP, "after") is None
+
+
+def test_cache_skips_invalid_and_recent(tmp_path):
+    path = str(tmp_path / "blockno.sqlite3")
+    cache = BlocknoCache(path)
+    cache.set("ethereum", TIMESTAMP, "before", "Error! No closest block found")
+    assert cache.get("ethereum", TIMESTAMP, "before") is None
+
+    recent = datetime.now(timezone.utc) - timedelta(minutes=1)
+    cache.set("ethereum", recent, "before", "100")
+    assert cache.get("ethereum", recent, "before") == "100"
+    cache.close()
+    assert BlocknoCache(path).get("ethereum", recent, "before") is None
+
+
+def test_blockno_api_uses_cache(tmp_path, monkeypatch):
+    blockno_cache.configure_blockno_cache(str(tmp_path / "blockno.sqlite3"))
+    calls = list()
+
+    def send(self, method, url, **kwargs):
+        calls.append(url)
+        return {"status": "1", "message": "OK", "result": "18908894"}
+
+    monkeypatch.setattr(GetBlocknoEtherscanApi, "send", send)
+    api = GetBlocknoEtherscanApi(SCAN_MAPPING["ethereum"])
+    for _ in range(3):
+        assert api.execute(timestamp=TIMESTAMP) == "18908894"
+    assert len(calls) == 1
+    blockno_cache.configure_blockno_cache(None)
@@ -0,0 +1,122 @@
+from decimal import Decimal
+
+import models
+from models import Erc20TxnRecord, Erc1155TxnRecord, TransactionRecord
+
+NETWORK = {"name": "ethereum", "symbol": "ETH"}
+ME = "0x00000000000000000000000000000000000000aa"
+OTHER = "0x0000000000000000000000000000000000000001"
+
+TX_HEADER = [
+    "Txhash",
+    "Blockno",
+    "UnixTimestamp",
+    "DateTime (UTC)",
+    "From",
+    "From_PrivateTag",
+    "To",
+    "To_PrivateTag",
+    "ContractAddress",
+    "Value_IN(ETH)",
+    "Value_OUT(ETH)",
+    "CurrentValue @ $2000/Eth",
+    "TxnFee(ETH)",
+    "TxnFee(USD)",
+    "Historical $Price/Eth",
+    "Status",
+    "ErrCode",
+    "Method",
+    "PrivateNote",
+]
+TX_ROW = [
+    "0x01",
+    "100",
+    "1704153600",
+    "2024-01-02 00:00:00",
+    ME.upper(),
+    "me",
+    OTHER,
+    "other",
+    "",
+    "0",
+    "1.5",
+    "3000",
+    "0.001",
+    "2.5",
+    "2000",
+    "",
+    "",
+    "Transfer",
+    "note",
+]
+
+
+def make_transaction(header, row):
+    with models.deferred_pricing():
+        return TransactionRecord(NETWORK, ME, ME, header, row)
+
+
+def test_column_map_by_name():
+    columns = TransactionRecord.make_column_map(TX_HEADER)
+    assert columns.has_private_tag
+    assert columns.index["txn_to"] == 6
+    assert columns.index["txn_fee_eth"] == 12
+    assert columns.index["txn_fee_usd"] == 13
+
+    record = make_transaction(TX_HEADER, TX_ROW)
+    assert record.txn_from == ME
+    assert record.txn_to == OTHER
+    assert record.quantity == -1 * Decimal("1.5")
+    assert record.txn_fee_usd == "2.5"
+    assert record.private_note == "note"
+
+
+def test_column_map_reordered():
+    order = list(reversed(range(len(TX_HEADER))))
+    header = [TX_HEADER[i] for i in order]
+    row = [TX_ROW[i] for i in order]
+    expected = make_transaction(TX_HEADER, TX_ROW)
+    record = make_transaction(header, row)
+    for key in ["txhash", "blockno", "txn_from", "txn_to", "txn_fee_eth", "method"]:
+        assert getattr(record, key) == getattr(expected, key)
+
+
+def test_column_map_by_position():
+    # 列名が分からない場合は従来の並び順で読む
+    header = [f"col{i}" for i in range(len(TX_HEADER))]
+    header[5] = "From_PrivateTag"
+    record = make_transaction(header, TX_ROW)
+    assert record.txn_to == OTHER
+    assert record.method == "Transfer"
+
+    # ヘッダーなしはPrivateTag/Blocknoなしの並び
+    row = ["0x02", "1704153600", "2024-01-02 00:00:00", OTHER, ME, "12", "1", "0xc"]
+    with models.deferred_pricing():
+        erc20 = Erc20TxnRecord(NETWORK, ME, ME, [], row + ["Token", "TKN"])
+    assert erc20.blockno == ""
+    assert erc20.value == 12
+    assert erc20.token_symbol == "TKN"
+    assert erc20.private_note == ""
+
+
+def test_column_map_nft_type():
+    header = [
+        "Txhash",
+        "Blockno",
+        "UnixTimestamp",
+        "DateTime (UTC)",
+        "From",
+        "To",
+        "ContractAddress",
+        "TokenName",
+        "TokenSymbol",
+        "TokenId",
+        "Type",
+        "Quantity",
+    ]
+    row = ["0x03", "1", "1704153600", "", OTHER, ME, "0xc", "Multi", "MLT", "7"]
+    record = Erc1155TxnRecord(NETWORK, ME, ME, header, row + ["1155", "3"])
+    assert not record.is_skip
+    assert record.token_id == "7"
+    assert record.quantity == 3
+    assert Erc1155TxnRecord(NETWORK, ME, ME, header, row + ["721", "1"]).is_skip
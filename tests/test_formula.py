@@ -0,0 +1,32 @@
+import re
+
+from util.formula import FormulaTemplate, column_letter, column_number
+
+
+def test_formula_template_render():
+    formula_template = FormulaTemplate("=ROUND({AE}{2} - $S{3}, 9)")
+    assert formula_template.render(3) == "=ROUND(AE2 - $S3, 9)"
+    assert formula_template.render(100) == "=ROUND(AE99 - $S100, 9)"
+    assert formula_template.render(column_shift=2) == "=ROUND(AG{2} - $S{3}, 9)"
+    assert formula_template.render(5, column_shift=4) == "=ROUND(AI4 - $S5, 9)"
+
+
+def test_formula_template_same_as_re_sub():
+    template_value = (
+        '=IF(ISBLANK(T{3}), "", _xlfn.INDIRECT(ADDRESS(ROW(),MATCH(T{3}&"(ave)",'
+        "$A$1:$GZ$1,0)))) + Z{2}"
+    )
+    formula_template = FormulaTemplate(template_value)
+    for row_index in range(3, 20):
+        expected = re.sub(
+            "({[0-9]+})",
+            lambda m: str(int(m.group(1)[1:-1]) + row_index - 3),
+            template_value,
+        )
+        assert formula_template.render(row_index) == expected
+
+
+def test_column_letter():
+    for num, letter in ((1, "A"), (26, "Z"), (27, "AA"), (52, "AZ"), (702, "ZZ")):
+        assert column_letter(num) == letter
+        assert column_number(letter) == num
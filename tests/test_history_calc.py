@@ -0,0 +1,139 @@
+from decimal import Decimal
+
+from history_calc import (
+    TEMPLATE_AMOUNT_FORMULA,
+    TEMPLATE_AVERAGE_FORMULA,
+    TEMPLATE_FORMULAS,
+    HistoryCalculator,
+)
+from util.formula import FormulaTemplate, column_number
+
+HEADER = [
+    "network",
+    "address",
+    "txhash",
+    "date_time",
+    "method",
+    "counterparty",
+    "counterparty_name",
+    "trade",
+    "application",
+    "status",
+    "売価手動",
+    "原価手動",
+    "レート手動",
+    "quantity",
+    "currency",
+    "currency_rate",
+    "fiat_quantity",
+    "fiat_currency",
+    "fee_quantity",
+    "fee_currency",
+    "fee_currency_rate",
+    "fee_fiat_quantity",
+    "fee_fiat_currency",
+    "dallar_yen",
+    "売却価額",
+    "売却原価",
+    "手数料",
+    "所得＄",
+    "所得￥",
+    "private_note",
+    "ETH(amt)",
+    "ETH(ave)",
+    "TOK(amt)",
+    "TOK(ave)",
+]
+INITIAL_ROW = ["initial balance"] + [None] * 29 + [0, 0, 0, 0]
+
+
+def make_formulas():
+    formulas = {
+        column_number(letter): template_value
+        for letter, template_value in TEMPLATE_FORMULAS.items()
+    }
+    for count in range(2):
+        for letter, template_value in (
+            TEMPLATE_AMOUNT_FORMULA,
+            TEMPLATE_AVERAGE_FORMULA,
+        ):
+            formulas[column_number(letter) + count * 2] = FormulaTemplate(
+                template_value
+            ).render(column_shift=count * 2)
+    return formulas
+
+
+def make_row(**values):
+    row = [""] * len(HEADER)
+    for letter, value in values.items():
+        row[column_number(letter) - 1] = value
+    return row
+
+
+def get(row, letter):
+    return row[column_number(letter) - 1]
+
+
+def test_history_calculator():
+    calculator = HistoryCalculator(HEADER, INITIAL_ROW, make_formulas(), 3)
+    assert column_number("G") not in calculator.columns
+    assert column_number("AF") in calculator.columns
+
+    fee = dict(S=Decimal("0.01"), T="ETH", X=Decimal("150"))
+    bought = calculator.calc(
+        make_row(H="購入", N=Decimal(2), O="ETH", P=Decimal(1000), **fee)
+    )
+    assert get(bought, "Q") == Decimal("2000.00")
+    assert get(bought, "AE") == Decimal("1.99")
+    assert get(bought, "AF") == Decimal(1000)
+    assert get(bought, "U") == Decimal(1000)
+    assert get(bought, "V") == Decimal("10.00")
+    assert get(bought, "Y") == 0
+    assert get(bought, "Z") == 0
+    assert get(bought, "AB") == Decimal(-10)
+    assert get(bought, "AC") == Decimal(-1500)
+    assert get(bought, "AG") == 0
+
+    sold = calculator.calc(
+        make_row(H="売却", N=Decimal(-1), O="eth", P=Decimal(1200), **fee)
+    )
+    assert get(sold, "AE") == Decimal("0.98")
+    assert get(sold, "AF") == Decimal(1000)
+    assert get(sold, "Y") == Decimal(1200)
+    assert get(sold, "Z") == Decimal(1000)
+    assert get(sold, "AB") == Decimal(190)
+    assert get(sold, "AC") == Decimal(28500)
+
+    # レートがない場合はExcelと同じく#VALUE!になり、平均単価にも引き継がれる
+    no_rate = calculator.calc(make_row(H="購入", N=Decimal(1), O="ETH", P="N/A", **fee))
+    assert get(no_rate, "Q") == "#VALUE!"
+    assert get(no_rate, "AE") == Decimal("1.97")
+    assert get(no_rate, "AF") == "#VALUE!"
+    assert get(no_rate, "V") == "#VALUE!"
+    moved = calculator.calc(make_row(H="転送", N=Decimal(-1), O="ETH", **fee))
+    assert get(moved, "AF") == "#VALUE!"
+    assert get(moved, "Z") == 0
+
+
+def test_history_calculator_changed_formula():
+    formulas = make_formulas()
+    formulas[column_number("Q")] = "=N{3}*P{3}"
+    calculator = HistoryCalculator(HEADER, INITIAL_ROW, formulas, 3)
+    # Qを参照する列も数式のまま出力する
+    assert sorted(calculator.columns) == [
+        column_number(letter) for letter in ("AE", "AG")
+    ]
+
+
+def test_history_calculator_large_amount():
+    # 18桁の生の値のままのエアドロップなど、28桁を超える残高でも計算できる
+    calculator = HistoryCalculator(HEADER, INITIAL_ROW, make_formulas(), 3)
+    amount = Decimal("12345678901234567890123456.5")
+    received = calculator.calc(make_row(H="転入", N=amount, O="TOK", P=Decimal("0.5")))
+    assert get(received, "AG") == amount
+    assert get(received, "AH") == Decimal("0.5")
+    assert get(received, "Q") == Decimal("6172839450617283945061728.25")
+
+    sold = calculator.calc(make_row(H="売却", N=-amount, O="TOK", P=Decimal("0.5")))
+    assert get(sold, "AG") == 0
+    assert get(sold, "Z") == Decimal("6172839450617283945061728.25")
@@ -0,0 +1,11 @@
+from tests.test_column_map import TX_HEADER, TX_ROW, make_transaction
+
+
+def test_record_slots():
+    record = make_transaction(TX_HEADER, TX_ROW)
+    assert not hasattr(record, "__dict__")
+    assert "txhash='0x01'" in repr(record)
+    # 同じアドレスは同じ文字列を共有する
+    other = make_transaction(TX_HEADER, TX_ROW)
+    assert record.txn_to is other.txn_to
+    assert record.my_address is other.txn_from
@@ -0,0 +1,106 @@
+import asyncio
+
+from scan_api.pagination import (
+    AsyncTxlistPaginator,
+    TxlistPaginator,
+    make_txlist_paginator,
+)
+
+
+class FakeTxlistApi:
+    """blockNumber昇順の行をpage/offset/startblockで切り出して返す"""
+
+    def __init__(self, rows, window):
+        self.rows = rows
+        self.window = window
+        self.calls = list()
+
+    def execute(self, **kwargs):
+        self.calls.append(kwargs)
+        page = kwargs["page"]
+        offset = kwargs["offset"]
+        if page * offset > self.window:
+            return None
+        startblock = kwargs.get("startblock") or 0
+        rows = [
+            dict(row, confirmations=str(len(self.calls)))
+            for row in self.rows
+            if int(row["blockNumber"]) >= startblock
+        ]
+        return rows[(page - 1) * offset : page * offset]
+
+
+def make_rows(count, per_block):
+    return [
+        {"blockNumber": str(i // per_block), "hash": f"0x{i:04x}"} for i in range(count)
+    ]
+
+
+def test_paginate_single_window():
+    rows = make_rows(25, 1)
+    api = FakeTxlistApi(rows, 100)
+    paginator = TxlistPaginator(api, "txlist", "0x0", page_size=10)
+    result = list(paginator)
+    assert [row["hash"] for row in result] == [row["hash"] for row in rows]
+    assert paginator.ok
+    assert len(api.calls) == 3
+
+
+def test_paginate_restart_from_last_block():
+    rows = make_rows(95, 3)
+    api = FakeTxlistApi(rows, 20)
+    paginator = TxlistPaginator(api, "txlist", "0x0", page_size=10)
+    paginator._max_page = 2
+    result = list(paginator)
+    assert [row["hash"] for row in result] == [row["hash"] for row in rows]
+    assert paginator.ok
+
+
+def test_paginate_window_exhausted_in_one_block():
+    rows = make_rows(30, 30)
+    api = FakeTxlistApi(rows, 20)
+    paginator = TxlistPaginator(api, "txlist", "0x0", page_size=10)
+    paginator._max_page = 2
+    result = list(paginator)
+    assert len(result) == 20
+    assert not paginator.ok
+
+
+def test_paginate_error_result():
+    api = FakeTxlistApi([], 20)
+    api.execute = lambda **kwargs: "Max rate limit reached"
+    paginator = TxlistPaginator(api, "txlist", "0x0", page_size=10)
+    assert list(paginator) == []
+    assert not paginator.ok
+
+
+def test_paginate_async():
+    rows = make_rows(95, 3)
+    api = FakeTxlistApi(rows, 20)
+
+    async def execute_async(client, **kwargs):
+        return api.execute(**kwargs)
+
+    api.execute_async = execute_async
+
+    async def collect():
+        paginator = AsyncTxlistPaginator(None, api, "txlist", "0x0", page_size=10)
+        paginator._max_page = 2
+        return [row async for row in paginator], paginator.ok
+
+    result, ok = asyncio.run(collect())
+    assert [row["hash"] for row in result] == [row["hash"] for row in rows]
+    assert ok
+
+
+def test_make_txlist_paginator_startblock():
+    class BlocknoApi:
+        def execute(self, **kwargs):
+            raise AssertionError("startblock is given")
+
+    rows = make_rows(10, 1)
+    api = FakeTxlistApi(rows, 100)
+    paginator = make_txlist_paginator(
+        BlocknoApi(), api, "txlist", "0x0", None, None, startblock=5, page_size=10
+    )
+    assert [row["blockNumber"] for row in paginator] == [str(i) for i in range(5, 10)]
@@ -0,0 +1,109 @@
+from datetime import datetime
+from decimal import Decimal
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import models
+from util.util import RateIndex, get_rate
+
+
+def make_rate_df():
+    return pd.DataFrame(
+        [
+            (datetime(2024, 1, 1), 141.5, "2200.1", None),
+            (datetime(2024, 1, 2), 142.0, float("nan"), "0.07"),
+            (datetime(2024, 1, 2), 999.0, "1", "1"),
+            (None, 1.0, "1", "1"),
+        ],
+        columns=["datetime", "usdjpy", "eth", "oas"],
+    )
+
+
+def test_rate_index():
+    rate_index = RateIndex.from_df(make_rate_df())
+    assert get_rate("USDJPY", "2024/01/01", rate_index) == Decimal("141.5")
+    assert get_rate("ETH", "2024/01/01", rate_index) == Decimal("2200.1")
+    assert get_rate("OAS", "2024/01/01", rate_index) == "N/A"
+    # 同じ日付の行が複数ある場合は先頭の行
+    assert get_rate("USDJPY", "2024/01/02", rate_index) == Decimal("142.0")
+    assert get_rate("ETH", "2024/01/02", rate_index) == "N/A"
+    assert get_rate("BTC", "2024/01/02", rate_index) == "N/A"
+    assert get_rate("ETH", "2024/01/03", rate_index) == "N/A"
+
+
+def test_get_rate_requires_rate_index():
+    rate_df = make_rate_df()
+    with pytest.raises(TypeError):
+        get_rate("OAS", "2024/01/02", rate_df)
+    assert get_rate("OAS", "2024/01/02", RateIndex.from_df(rate_df)) == Decimal("0.07")
+
+
+def write_rate_xlsx(path, usdjpy):
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.append(["", "datetime", "usdjpy", "eth"])
+    sheet.append([0, datetime(2024, 1, 1), usdjpy, "2200.1"])
+    book.save(path)
+
+
+def test_load_rate_index_uses_cache(tmp_path, monkeypatch):
+    path = str(tmp_path / "rate.xlsx")
+    cache_path = str(tmp_path / "cache" / "rate.pickle")
+    write_rate_xlsx(path, 141.5)
+
+    rate_index = models.load_rate_index(path, cache_path)
+    assert get_rate("USDJPY", "2024/01/01", rate_index) == Decimal("141.5")
+
+    def load_rate_df(path):
+        raise AssertionError("xlsx is parsed")
+
+    with monkeypatch.context() as m:
+        m.setattr(models, "load_rate_df", load_rate_df)
+        rate_index = models.load_rate_index(path, cache_path)
+    assert get_rate("ETH", "2024/01/01", rate_index) == Decimal("2200.1")
+
+    # xlsxが更新されたら読み直す
+    write_rate_xlsx(path, 150.0)
+    rate_index = models.load_rate_index(path, cache_path)
+    assert get_rate("USDJPY", "2024/01/01", rate_index) == Decimal("150.0")
+
+
+class PricedRecord(models.AbstractRecord):
+    def __init__(self, unix_timestamp, symbol):
+        self.unix_timestamp = str(unix_timestamp)
+        self.symbol = symbol
+        self.quantity = Decimal("2")
+
+    def get_rate_symbol(self):
+        return self.symbol
+
+    def get_fiat_quantity(self):
+        if self.unit_price == "N/A":
+            return ""
+        return self.quantity * self.unit_price
+
+
+def test_price_records(monkeypatch):
+    rate_index = RateIndex.from_df(make_rate_df())
+    monkeypatch.setattr(models, "get_rate_index", lambda: rate_index)
+
+    # 2024/01/02 08:59:59 JSTまでは2024/01/01の取引日
+    records = [
+        PricedRecord(1704153599, "ETH"),
+        PricedRecord(1704153600, "OAS"),
+        PricedRecord(1704153600, "ETH"),
+        PricedRecord(1704153600, "BTC"),
+    ]
+    with models.deferred_pricing():
+        assert records[0].get_unit_price() == "N/A"
+    models.price_records(records)
+
+    for record in records:
+        expected = get_rate(record.symbol, record.get_trading_date(), rate_index)
+        assert record.unit_price == expected
+    assert records[0].unit_price == Decimal("2200.1")
+    assert records[0].fiat_quantity == Decimal("4400.2")
+    assert records[1].unit_price == Decimal("0.07")
+    assert records[2].unit_price == "N/A"
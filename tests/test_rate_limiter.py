@@ -0,0 +1,37 @@
+import time
+
+from util.rate_limiter import RateLimiter, get_rate_limiter
+
+
+def test_reserve_burst_then_rate():
+    limiter = RateLimiter(rps=10.0, burst=2)
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 0.0
+    wait = limiter.reserve()
+    assert 0.05 < wait <= 0.1
+
+
+def test_acquire_spaces_requests():
+    limiter = RateLimiter(rps=50.0, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_backoff_blocks_until_retry_after():
+    limiter = RateLimiter(rps=100.0, burst=10, backoff_base=0.1)
+    delay = limiter.backoff(0, retry_after="0.3")
+    assert delay == 0.3
+    assert 0.2 < limiter.reserve() <= 0.3
+
+
+def test_backoff_is_capped():
+    limiter = RateLimiter(backoff_base=1.0, backoff_max=4.0)
+    for attempt in range(10):
+        assert limiter.backoff(attempt) <= 4.0
+
+
+def test_get_rate_limiter_shared_by_key():
+    assert get_rate_limiter(("url", "key")) is get_rate_limiter(("url", "key"))
+    assert get_rate_limiter(("url", "key")) is not get_rate_limiter(("url", "key2"))
@@ -0,0 +1,65 @@
+import os
+
+from scan_api import convert_raw
+from scan_api.etherscan import write_etherscan_txlist
+from scan_api.raw_store import RawStore
+from scan_api.sync import IncrementalSync
+from scan_api.types import SCAN_MAPPING
+
+SCAN = SCAN_MAPPING["ethereum"]
+
+TXLIST_ROW = {
+    "blockHash": "0x01",
+    "blockNumber": "1",
+    "confirmations": "10",
+    "contractAddress": "",
+    "cumulativeGasUsed": "21000",
+    "from": "0x0",
+    "functionName": "",
+    "gas": "21000",
+    "gasPrice": "1000000000",
+    "gasUsed": "21000",
+    "hash": "0xa",
+    "input": "0xdeadbeef",
+    "isError": "0",
+    "methodId": "0x",
+    "nonce": "0",
+    "timeStamp": "1704067200",
+    "to": "0x1",
+    "transactionIndex": "0",
+    "txreceipt_status": "1",
+    "value": "1000000000000000000",
+}
+
+
+def test_raw_store_roundtrip(tmp_path):
+    store = RawStore(str(tmp_path), "0x0", SCAN, "txlist.csv", "gz")
+    assert not store.exists()
+    rows = [TXLIST_ROW, {"blockNumber": "2", "tokenName": None, "値": "あ"}]
+    store.write(iter(rows))
+    assert store.path.endswith("/0x0/ethereum/raw/txlist.ndjson.gz")
+    assert list(store.read()) == rows
+    # 既存のファイルの形式を引き継ぐ
+    assert RawStore(str(tmp_path), "0x0", SCAN, "txlist.csv").compression == "gz"
+
+
+def test_sync_keeps_dropped_fields_in_raw(tmp_path):
+    output_directory = str(tmp_path)
+    sync = IncrementalSync(output_directory, "0x0", SCAN, "txlist.csv", False)
+    sync.write(
+        write_etherscan_txlist, SCAN, "0x0", [dict(TXLIST_ROW)], output_directory
+    )
+    assert list(sync.raw.read())[0]["input"] == "0xdeadbeef"
+
+
+def test_convert_raw(tmp_path):
+    output_directory = str(tmp_path)
+    RawStore(output_directory, "0x0", SCAN, "txlist.csv").write([dict(TXLIST_ROW)])
+    convert_raw([SCAN], "0x0", output_directory)
+
+    network_directory = os.path.join(output_directory, "0x0", "ethereum")
+    with open(os.path.join(network_directory, "transactions.csv")) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 2
+    assert '"0xa"' in lines[1]
+    assert not os.path.exists(os.path.join(network_directory, "internals.csv"))
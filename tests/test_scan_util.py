@@ -0,0 +1,54 @@
+import asyncio
+import os
+
+import pytest
+
+from scan_api.util import consume_in_thread, iter_write_csv, write_csv
+
+
+def test_write_csv_from_generator(tmp_path):
+    rows = ({"a": str(i), "b": "x"} for i in range(3))
+    write_csv(str(tmp_path), "out.csv", ["a"], rows, ["b"])
+    with open(tmp_path / "out.csv") as f:
+        assert f.read().splitlines() == ['"a"', '"0"', '"1"', '"2"']
+
+
+def test_iter_write_csv_keeps_existing_file_on_failure(tmp_path):
+    write_csv(str(tmp_path), "out.csv", ["a"], [{"a": "old"}])
+
+    def rows():
+        yield {"a": "new"}
+        raise RuntimeError("fetch failed")
+
+    with pytest.raises(RuntimeError):
+        for _ in iter_write_csv(str(tmp_path), "out.csv", ["a"], rows()):
+            pass
+    with open(tmp_path / "out.csv") as f:
+        assert f.read().splitlines() == ['"a"', '"old"']
+    assert os.listdir(tmp_path) == ["out.csv"]
+
+
+def test_consume_in_thread_is_bounded():
+    async def rows():
+        for i in range(50):
+            yield {"i": i}
+
+    def consume(data):
+        return [row["i"] for row in data]
+
+    result = asyncio.run(consume_in_thread(rows(), consume, maxsize=2))
+    assert result == list(range(50))
+
+
+def test_consume_in_thread_aborts_consumer(tmp_path):
+    async def rows():
+        yield {"a": "new"}
+        raise ValueError("fetch failed")
+
+    def consume(data):
+        write_csv(str(tmp_path), "out.csv", ["a"], data)
+
+    with pytest.raises(ValueError):
+        asyncio.run(consume_in_thread(rows(), consume))
+    # 中断された書き出しは一時ファイルごと破棄される
+    assert os.listdir(tmp_path) == []
@@ -15,6 +15,7 @@ JST = ZoneInfo("Asia/Tokyo")
 
 import pytest  # noqa: E402
 
+from tests.test_column_map import TX_HEADER, TX_ROW, make_transaction  # noqa: E402
 from util import api_base  # noqa: E402
 from util.util import timestamp_fromdatetime  # noqa: E402
 
@@ -60,3 +61,20 @@ def test_unixtimestamp():
 
     print(start.strftime("%Y-%m-%d %H:%M:%S"))
     print(end.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def test_record_timestamp_fields():
+    record = make_transaction(TX_HEADER, TX_ROW)
+    assert record.timestamp == 1704153600
+    assert record.get_date_time() == "2024/01/02 09:00:00"
+    assert record.get_date_time("%Y/%m/%d") == "2024/01/02"
+
+    # JSTの08:59:59までは前日の取引日
+    for unix_timestamp, trading_date in [
+        ("1704153599", "2024/01/01"),
+        ("1704153600", "2024/01/02"),
+        ("1704239999", "2024/01/02"),
+    ]:
+        record.unix_timestamp = unix_timestamp
+        assert record.get_trading_date() == trading_date
+    assert record.get_date_time() == "2024/01/03 08:59:59"
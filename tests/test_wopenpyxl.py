@@ -0,0 +1,81 @@
+import openpyxl as px
+
+from wopenpyxl import WriteOnlyWOpenpyxl
+
+TEMPLATE_PATH = "./template.xlsx"
+
+
+def test_write_only_copy_sheet(tmp_path):
+    template = px.load_workbook(TEMPLATE_PATH)
+    book = WriteOnlyWOpenpyxl(TEMPLATE_PATH)
+    for sheet_name in book.template_sheet_names:
+        book.copy_sheet(sheet_name)
+    path = str(tmp_path / "copy.xlsx")
+    book.save_as(path)
+
+    result = px.load_workbook(path)
+    assert result.sheetnames == template.sheetnames
+    assert result.active.title == template.active.title
+    for sheet_name in template.sheetnames:
+        expected, actual = template[sheet_name], result[sheet_name]
+        assert expected.max_row == actual.max_row
+        assert expected.max_column == actual.max_column
+        for expected_row, actual_row in zip(expected.iter_rows(), actual.iter_rows()):
+            for expected_cell, actual_cell in zip(expected_row, actual_row):
+                assert expected_cell.value == actual_cell.value
+                assert expected_cell.data_type == actual_cell.data_type
+                assert repr(expected_cell.font) == repr(actual_cell.font)
+                assert repr(expected_cell.fill) == repr(actual_cell.fill)
+                assert expected_cell.quotePrefix == actual_cell.quotePrefix
+
+
+def test_write_only_create_sheet(tmp_path):
+    template = px.load_workbook(TEMPLATE_PATH)
+    book = WriteOnlyWOpenpyxl(TEMPLATE_PATH)
+    book.create_sheet("network/1", "template")
+    style = book.make_style("0.00")
+    book.append(
+        [
+            list(book.iter_template_rows("template", 1, 1))[0],
+            ["a", 1, "=B2*2", book.make_cell(2, style), book.make_cell(None, style)],
+        ]
+    )
+    path = str(tmp_path / "create.xlsx")
+    book.save_as(path)
+
+    ws = px.load_workbook(path)["network1"]
+    assert [cell.value for cell in ws[1]] == [
+        cell.value for cell in template["template"][1]
+    ]
+    assert [cell.value for cell in ws[2]][:4] == ["a", 1, "=B2*2", 2]
+    assert ws["D2"].number_format == "0.00"
+    assert ws["E2"].number_format == "0.00"
+    assert ws.column_dimensions["A"].width == (
+        template["template"].column_dimensions["A"].width
+    )
+
+
+def test_write_only_shared_formula(tmp_path):
+    book = WriteOnlyWOpenpyxl(TEMPLATE_PATH, shared_formula=True)
+    book.create_sheet("shared")
+    first, rest = book.make_shared_formula(3, 1, 3, "=A1+B$1", "=A3+B$1")
+    assert dict(first) == {"t": "shared", "ref": "C1:C3", "si": "0"}
+    assert dict(rest) == {"t": "shared", "si": "0"}
+    # ずらした数式がlast_textと違う場合は共有しない
+    assert book.make_shared_formula(4, 1, 3, "=ROW()+1", "=ROW()+3") is None
+    book.append([[1, 2, first], [3, 4, rest], [5, 6, rest]])
+    path = str(tmp_path / "shared.xlsx")
+    book.save_as(path)
+
+    ws = px.load_workbook(path)["shared"]
+    assert [ws.cell(row, 3).value for row in range(1, 4)] == [
+        "=A1+B$1",
+        "=A2+B$1",
+        "=A3+B$1",
+    ]
+
+
+def test_write_only_shared_formula_disabled():
+    book = WriteOnlyWOpenpyxl(TEMPLATE_PATH)
+    book.create_sheet("shared")
+    assert book.make_shared_formula(3, 1, 3, "=A1", "=A3") is None
@@ -1,20 +1,275 @@
+import asyncio
+import codecs
 import json
+import threading
 import urllib.parse
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from util.rate_limiter import RateLimiter
+
+DEFAULT_POOL_SIZE = 10
+# asyncioで同時に投げるリクエスト数の上限
+DEFAULT_CONCURRENCY = 16
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+# 200で返ってくるレート制限の応答 例: "Max rate limit reached"
+THROTTLE_MESSAGES = ["rate limit"]
+
+_pool_size = DEFAULT_POOL_SIZE
+_sessions: Dict[str, requests.Session] = dict()
+_sessions_lock = threading.Lock()
+
+
+def configure_session(pool_size: int = DEFAULT_POOL_SIZE):
+    """コネクションプールの設定
+    作成済みのセッションは閉じて次回の通信で作り直す
+    :param pool_size: ホストごとに保持するコネクション数
+    """
+    global _pool_size
+    with _sessions_lock:
+        _pool_size = pool_size
+        _close_sessions()
+
+
+def get_session(url: str) -> requests.Session:
+    """ホストごとに共有するkeep-aliveセッションを取得"""
+    parsed = urllib.parse.urlsplit(url)
+    host = f"{parsed.scheme}://{parsed.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=_pool_size, pool_block=True
+            )
+            session.mount(host, adapter)
+            _sessions[host] = session
+        return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        _close_sessions()
+
+
+def _close_sessions():
+    for session in _sessions.values():
+        session.close()
+    _sessions.clear()
+
+
+def decode_response(content: bytes):
+    """レスポンスボディをJSONとして解釈する
+    JSONでない場合のみHTMLで包まれているとみなしてBeautifulSoupで取り出す
+    """
+    try:
+        return json.loads(content)
+    except ValueError:
+        soup = BeautifulSoup(content, "html.parser")
+        return json.loads(soup.string)
+
+
+def is_throttled(response) -> bool:
+    if not isinstance(response, dict):
+        return False
+    for value in (response.get("result"), response.get("message")):
+        if isinstance(value, str) and any(
+            message in value.lower() for message in THROTTLE_MESSAGES
+        ):
+            return True
+    return False
+
+
+class JsonResultStream:
+    """トップレベルのオブジェクトの配列項目を1件ずつデコードして返す
+    配列以外の項目(status/messageなど)は読み進めた分だけresponseに入る
+    対象の項目が配列でなかった場合はis_arrayがFalseになる
+    """
+
+    _decoder = json.JSONDecoder()
+    _whitespace = " \t\n\r"
+
+    def __init__(self, chunks: Iterable[bytes], key: str = "result"):
+        self.key = key
+        self.response = dict()
+        self.is_array = False
+
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._started = False
+
+    def __iter__(self) -> Iterator:
+        if not self.start():
+            return
+        yield from self._items()
+        while self._expect(",}") == ",":
+            key = self._value()
+            self._expect(":")
+            self.response[key] = self._value()
+
+    def start(self) -> bool:
+        """keyの配列の先頭まで読み進める
+        配列でなければオブジェクトの最後まで読んでFalseを返す
+        """
+        if self._started:
+            return self.is_array
+        self._started = True
+        self._expect("{")
+        if self._peek() == "}":
+            return False
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == self.key and self._peek() == "[":
+                self.is_array = True
+                return True
+            self.response[key] = self._value()
+            if self._expect(",}") == "}":
+                return False
+
+    def _items(self) -> Iterator:
+        self._expect("[")
+        if self._peek() == "]":
+            self._expect("]")
+            return
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._text_decoder.decode(b"", final=True)
+        else:
+            text = self._text_decoder.decode(chunk)
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while (
+                self._pos < len(self._buffer)
+                and self._buffer[self._pos] in self._whitespace
+            ):
+                self._pos = self._pos + 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("unexpected end of json")
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"unexpected {char!r} in json, expected {chars!r}")
+        self._pos = self._pos + 1
+        return char
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # 数値などはバッファ末尾で途切れている可能性があるので続きを読む
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except ValueError:
+                if self._eof:
+                    raise
+            self._fill()
+
+
+class AsyncClient:
+    """aiohttpのセッションと同時実行数の上限
+    async withの中でAPIBase.execute_asyncに渡して使う
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ):
+        self._concurrency = concurrency
+        self._pool_size = pool_size
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        connector = aiohttp.TCPConnector(
+            limit=self._concurrency, limit_per_host=self._pool_size
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector, headers={"Accept-Encoding": "gzip, deflate"}
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def request(
+        self, method: str, url: str, **kwargs
+    ) -> Tuple[aiohttp.ClientResponse, bytes]:
+        """通信してレスポンスとボディを返す"""
+        async with self._semaphore:
+            async with self._session.request(method, url, **kwargs) as r:
+                return r, await r.read()
 
 
 class APIBase:
+    # 設定されている場合はリクエストごとに待ち、429/5xxやレート制限の応答を再試行する
+    rate_limiter: Optional[RateLimiter] = None
+
     def parse(self, response):
         raise NotImplementedError()
 
     def get_url_with_params(self, **kwargs):
         raise NotImplementedError()
 
-    def execute(self, **kwargs):
-        url = self.get_url_with_params(**kwargs)
-        r = requests.get(url)
+    def should_retry(self, attempt: int, is_retryable: bool) -> bool:
+        return (
+            is_retryable
+            and self.rate_limiter is not None
+            and attempt < self.rate_limiter.max_retries
+        )
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None):
+        delay = self.rate_limiter.backoff(attempt, retry_after)
+        print("retry({}) after {:.1f}s".format(attempt + 1, delay))
+
+    def request(self, method: str, url: str, **kwargs):
+        """共有セッションで通信し、404の場合はNoneを返す"""
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            r = get_session(url).request(method, url, **kwargs)
+            if not self.should_retry(attempt, r.status_code in RETRY_STATUS_CODES):
+                break
+            r.close()
+            self.backoff(attempt, r.headers.get("Retry-After"))
+            attempt = attempt + 1
+
         try:
             r.raise_for_status()
         except requests.exceptions.HTTPError as e:
@@ -25,45 +280,123 @@ class APIBase:
         except Exception as e:
             print('raise_for_status : {}'.format(e))
             raise e
+        return r
 
-        soup = BeautifulSoup(r.content, "html.parser")
-        response = json.loads(soup.string)
-        return self.parse(response)
+    def send(self, method: str, url: str, **kwargs):
+        """通信してJSONを返す、レート制限の応答の場合は再試行する"""
+        attempt = 0
+        while True:
+            r = self.request(method, url, **kwargs)
+            if r is None:
+                return None
+            response = decode_response(r.content)
+            if not self.should_retry(attempt, is_throttled(response)):
+                return response
+            self.backoff(attempt)
+            attempt = attempt + 1
+
+    async def request_async(
+        self, client: AsyncClient, method: str, url: str, **kwargs
+    ) -> Optional[bytes]:
+        """requestのasyncio版、ボディを返す"""
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+            r, content = await client.request(method, url, **kwargs)
+            if not self.should_retry(attempt, r.status in RETRY_STATUS_CODES):
+                break
+            self.backoff(attempt, r.headers.get("Retry-After"))
+            attempt = attempt + 1
 
-    def post(self, payload, **kwargs):
-        url = self.get_url_with_params(**kwargs)
-        r = requests.post(url, json=payload)
         try:
             r.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            print('raise_for_status : {}'.format(e))
-            if e.response.status_code == 404:
+        except aiohttp.ClientResponseError as e:
+            print("raise_for_status : {}".format(e))
+            if e.status == 404:
                 return None
             raise e
-        except Exception as e:
-            print('raise_for_status : {}'.format(e))
-            raise e
+        return content
+
+    async def send_async(self, client: AsyncClient, method: str, url: str, **kwargs):
+        """sendのasyncio版"""
+        attempt = 0
+        while True:
+            content = await self.request_async(client, method, url, **kwargs)
+            if content is None:
+                return None
+            response = decode_response(content)
+            if not self.should_retry(attempt, is_throttled(response)):
+                return response
+            self.backoff(attempt)
+            attempt = attempt + 1
 
-        soup = BeautifulSoup(r.content, "html.parser")
-        response = json.loads(soup.string)
+    def execute(self, **kwargs):
+        url = self.get_url_with_params(**kwargs)
+        response = self.send("GET", url)
+        if response is None:
+            return None
         return self.parse(response)
 
-    def query(self, mutation, **kwargs):
+    def execute_stream(self, key: str = "result", **kwargs):
+        """レスポンスを読みながらkeyの配列項目を1件ずつ返す
+        parseは通さない、keyが配列でなくレート制限の応答の場合はsendと同じく再試行する
+        JSONとして読めない(HTMLで包まれている)場合はsendと同じくまとめて解釈してkeyの値を返す
+        """
         url = self.get_url_with_params(**kwargs)
-        r = requests.post(url, json={'query': mutation})
-        try:
-            r.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            print('raise_for_status : {}'.format(e))
-            if e.response.status_code == 404:
+        attempt = 0
+        while True:
+            r = self.request("GET", url, stream=True)
+            if r is None:
                 return None
-            raise e
-        except Exception as e:
-            print('raise_for_status : {}'.format(e))
-            raise e
+            # 配列の先頭まで読めるまでは読んだ分を残しておく
+            received: Optional[List[bytes]] = list()
+
+            def iter_chunks(r=r) -> Iterator[bytes]:
+                for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+                    if received is not None:
+                        received.append(chunk)
+                    yield chunk
+
+            chunks = iter_chunks()
+            stream = JsonResultStream(chunks, key)
+            try:
+                is_array = stream.start()
+            except ValueError:
+                for _ in chunks:
+                    pass
+                response = decode_response(b"".join(received))
+                if not self.should_retry(attempt, is_throttled(response)):
+                    return response.get(key) if isinstance(response, dict) else None
+            else:
+                received = None
+                if is_array or not self.should_retry(
+                    attempt, is_throttled(stream.response)
+                ):
+                    return stream
+            r.close()
+            self.backoff(attempt)
+            attempt = attempt + 1
 
-        soup = BeautifulSoup(r.content, "html.parser")
-        response = json.loads(soup.string)
+    async def execute_async(self, client: AsyncClient, **kwargs):
+        url = self.get_url_with_params(**kwargs)
+        response = await self.send_async(client, "GET", url)
+        if response is None:
+            return None
+        return self.parse(response)
+
+    def post(self, payload, **kwargs):
+        url = self.get_url_with_params(**kwargs)
+        response = self.send("POST", url, json=payload)
+        if response is None:
+            return None
+        return self.parse(response)
+
+    def query(self, mutation, **kwargs):
+        url = self.get_url_with_params(**kwargs)
+        response = self.send("POST", url, json={'query': mutation})
+        if response is None:
+            return None
         return self.parse(response)
 
     @classmethod
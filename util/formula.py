@@ -0,0 +1,59 @@
+import re
+from typing import List, Optional, Tuple
+
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
+
+# {行番号}と{列名}のプレースホルダー
+REGEX_FORMULA_PLACEHOLDER = re.compile("{([0-9]+)}|{([A-Z]+)}")
+
+# 数式のテンプレートを置き換える基準の行番号
+TEMPLATE_ROW_IDX = 3
+
+
+def column_letter(num: int) -> str:
+    """列番号を列名にする(openpyxlの変換表を使う) 例: 31 -> AE"""
+    return get_column_letter(num)
+
+
+def column_number(letter: str) -> int:
+    """列名を列番号にする(openpyxlの変換表を使う) 例: AE -> 31"""
+    return column_index_from_string(letter)
+
+
+class FormulaTemplate:
+    """
+    数式のテンプレートを文字列の部分と{行番号}/{列名}の部分に分けたもの
+    一度だけ解析しておき、行や列をずらした数式は文字列の連結だけで作る
+    {行番号}はtemplate_row_idxの行を基準にずらす、{列名}は列番号でずらす
+    """
+
+    def __init__(self, template_value: str, template_row_idx: int = TEMPLATE_ROW_IDX):
+        self.template_value = template_value
+        self._parts: List[str] = list()
+        self._rows: List[Tuple[int, int]] = list()
+        self._columns: List[Tuple[int, int]] = list()
+
+        position = 0
+        for match in REGEX_FORMULA_PLACEHOLDER.finditer(template_value):
+            self._parts.append(template_value[position : match.start()])
+            row, column = match.groups()
+            if row is not None:
+                self._rows.append((len(self._parts), int(row) - template_row_idx))
+            else:
+                self._columns.append((len(self._parts), column_number(column)))
+            self._parts.append(match.group(0))
+            position = match.end()
+        self._parts.append(template_value[position:])
+
+    def render(self, row_index: Optional[int] = None, column_shift: int = 0) -> str:
+        """
+        row_indexの行の数式にする、Noneの場合は{行番号}をそのまま残す
+        column_shift: {列名}をずらす列数
+        """
+        parts = list(self._parts)
+        if row_index is not None:
+            for i, offset in self._rows:
+                parts[i] = str(row_index + offset)
+        for i, num in self._columns:
+            parts[i] = column_letter(num + column_shift)
+        return "".join(parts)
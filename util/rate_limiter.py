@@ -0,0 +1,90 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, Hashable, Optional
+
+DEFAULT_RPS = 5.0
+DEFAULT_BURST = 5
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+
+
+class RateLimiter:
+    """トークンバケットによるレート制限
+    スレッドとasyncioのタスクの両方から共有できる
+    スロットリングされた場合はbackoffで共有している全体を待たせる
+    """
+
+    def __init__(
+        self,
+        rps: float = DEFAULT_RPS,
+        burst: int = DEFAULT_BURST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+    ):
+        self.rps = rps
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def reserve(self) -> float:
+        """トークンを1つ予約して、使えるようになるまでの秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self.burst), self._tokens + (now - self._updated) * self.rps
+            )
+            self._updated = now
+            self._tokens = self._tokens - 1
+            wait = -self._tokens / self.rps if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """attempt回目の再試行までの待ち時間(指数バックオフ+ジッター)を決めて返す
+        次のacquireはその時間が経つまで待つ
+        """
+        cap = min(self.backoff_max, self.backoff_base * (2**attempt))
+        delay = cap / 2 + random.uniform(0, cap / 2)
+        if retry_after is not None:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
+
+
+_rate_limiters: Dict[Hashable, RateLimiter] = dict()
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    key: Hashable, rps: float = DEFAULT_RPS, burst: int = DEFAULT_BURST
+) -> RateLimiter:
+    """keyごとに共有するRateLimiterを取得"""
+    with _rate_limiters_lock:
+        rate_limiter = _rate_limiters.get(key)
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(rps, burst)
+            _rate_limiters[key] = rate_limiter
+        return rate_limiter
@@ -1,8 +1,10 @@
 import math
 from datetime import datetime
 from decimal import Decimal
+from typing import Dict, Optional, Tuple, Union
 
-from numpy import ndarray
+import numpy as np
+import pandas as pd
 from pandas import DataFrame
 from pytz import timezone
 
@@ -19,22 +21,100 @@ def datetime_fromtimestamp(timestamp):
     )
 
 
+# Decimalは不変なので頻出する0は同じオブジェクトを使い回す
+DECIMAL_ZERO = Decimal(0)
+
+
 def to_decimal(value: str):
+    if value == "0":
+        return DECIMAL_ZERO
     return Decimal(value.replace(",", ""))
 
 
-def get_rate(symbol: str, date_time: str, rate_df: DataFrame) -> Decimal:
-    symbol_lower = symbol.lower()
-    rate_by_date_time = rate_df[rate_df["datetime"] == date_time]
-    if (
-        symbol_lower not in rate_by_date_time
-        or rate_by_date_time[symbol_lower].size == 0
-    ):
-        return "N/A"
-    value = rate_by_date_time[symbol_lower].values[0]
-    if isinstance(value, ndarray):
-        value = value[0]
-    if value is None or str(value).lower() == "nan":
-        return "N/A"
-    # print(rate)
-    return to_decimal(str(value))
+NOT_AVAILABLE = "N/A"
+
+
+class RateIndex:
+    """日付(YYYY/MM/DD)と小文字のシンボルで引くレートの索引
+    レートは読み込み時にDecimalに変換しておく、値がない場合はN/A
+    """
+
+    DATE_FORMAT = "%Y/%m/%d"
+
+    def __init__(self, rates: Dict[Tuple[str, str], Union[Decimal, str]]):
+        self._rates = rates
+        self._frame: Optional[DataFrame] = None
+
+    @classmethod
+    def from_df(cls, rate_df: DataFrame) -> "RateIndex":
+        rates: Dict[Tuple[str, str], Union[Decimal, str]] = dict()
+        # 同じ名前の列が複数ある場合は先頭の列を使う
+        columns = dict()
+        for i, column in enumerate(rate_df.columns):
+            if column != "datetime" and isinstance(column, str):
+                columns.setdefault(column, i)
+        date_times = rate_df["datetime"]
+        if isinstance(date_times, DataFrame):
+            date_times = date_times.iloc[:, 0]
+        for row_number, date_time in enumerate(date_times):
+            if date_time is None or pd.isna(date_time):
+                continue
+            date = cls.format_date(date_time)
+            for symbol, column in columns.items():
+                # 同じ日付の行が複数ある場合は先頭の行を使う
+                if (date, symbol) in rates:
+                    continue
+                value = rate_df.iat[row_number, column]
+                if value is None or str(value).lower() == "nan":
+                    rates[(date, symbol)] = NOT_AVAILABLE
+                else:
+                    rates[(date, symbol)] = to_decimal(str(value))
+        return cls(rates)
+
+    @classmethod
+    def format_date(cls, date_time) -> str:
+        if isinstance(date_time, str):
+            return pd.Timestamp(date_time).strftime(cls.DATE_FORMAT)
+        return date_time.strftime(cls.DATE_FORMAT)
+
+    def get(self, symbol: str, date_time: str) -> Union[Decimal, str]:
+        return self._rates.get((date_time, symbol.lower()), NOT_AVAILABLE)
+
+    def to_frame(self) -> DataFrame:
+        """day(1970/01/01からの日数)/symbol/rateの列に展開したDataFrame
+        まとめて結合する時に使う
+        """
+        if self._frame is None:
+            epoch = datetime(1970, 1, 1)
+            days = {
+                date: (datetime.strptime(date, self.DATE_FORMAT) - epoch).days
+                for date in set(date for date, _ in self._rates.keys())
+            }
+            self._frame = DataFrame(
+                {
+                    "day": np.array(
+                        [days[date] for date, _ in self._rates.keys()], dtype=np.int64
+                    ),
+                    "symbol": [symbol for _, symbol in self._rates.keys()],
+                    "rate": list(self._rates.values()),
+                }
+            )
+        return self._frame
+
+    def __getstate__(self):
+        return {"_rates": self._rates}
+
+    def __setstate__(self, state):
+        self._rates = state["_rates"]
+        self._frame = None
+
+
+def get_rate(symbol: str, date_time: str, rates: RateIndex) -> Decimal:
+    """date_timeはYYYY/MM/DD、レートがない場合はN/Aを返す
+    DataFrameは呼び出しごとに索引を作ることになるので、RateIndex.from_dfで作った索引を渡す
+    """
+    if not isinstance(rates, RateIndex):
+        raise TypeError(
+            f"rates must be RateIndex, not {type(rates).__name__} (use RateIndex.from_df)"
+        )
+    return rates.get(symbol, date_time)
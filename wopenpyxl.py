@@ -2,14 +2,37 @@ import datetime
 from copy import copy
 
 import openpyxl as px
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.compat import safe_string
+from openpyxl.formula.tokenizer import Token, Tokenizer, TokenizerError
+from openpyxl.formula.translate import Translator
 from openpyxl.styles import PatternFill
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.utils.cell import get_column_letter
 from openpyxl.workbook import child
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+from openpyxl.worksheet.formula import ArrayFormula
 from openpyxl.worksheet.worksheet import Worksheet
 
 # 2007 Office system ファイル形式の MIME タイプをサーバーで登録する
 # https://technet.microsoft.com/ja-jp/library/ee309278(v=office.12).aspx
 XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
+# テンプレートと共有するbookの書式のテーブル
+STYLE_ATTRIBUTES = (
+    "_fonts",
+    "_alignments",
+    "_borders",
+    "_fills",
+    "_number_formats",
+    "_protections",
+    "_colors",
+    "_cell_styles",
+    "_named_styles",
+    "_table_styles",
+    "_differential_styles",
+)
+
 
 class WOpenpyxl:
     """openpyxlラッパー
@@ -263,3 +286,206 @@ class WOpenpyxl:
                 if do_copy_style and template_col.has_style:
                     # _styleはprotectedだけどアクセスするしかない
                     target_cell._style = copy(template_col._style)
+
+
+class SharedFormula(ArrayFormula):
+    """共有数式(t="shared")
+    openpyxlは共有数式の書き込みに対応していないので、ArrayFormulaの書き出しを利用する
+    範囲の先頭のセルはrefと数式、残りのセルはsiだけを書く
+    """
+
+    t = "shared"
+
+    def __init__(self, si: int, ref=None, text=None):
+        super().__init__(ref, text)
+        self.si = si
+
+    def __iter__(self):
+        for k in ["t", "ref", "si"]:
+            v = getattr(self, k)
+            if v is not None:
+                yield k, safe_string(v)
+
+
+def is_same_formula(formula1: str, formula2: str) -> bool:
+    """空白を除いたトークンが同じかどうか"""
+
+    def tokens(formula):
+        return [
+            (token.type, token.subtype, token.value)
+            for token in Tokenizer(formula).items
+            if token.type != Token.WSPACE
+        ]
+
+    return tokens(formula1) == tokens(formula2)
+
+
+class WriteOnlyWOpenpyxl:
+    """書き込み専用(write_only)のopenpyxlラッパー
+    テンプレートのbookの書式をそのまま使い、行は追加した順にxlsxへ書き出す
+    書き出した行はメモリに残らないので、後からセルを変更することはできない
+    """
+
+    def __init__(self, template_path, shared_formula=False):
+        """
+        :param template_path: 書式やシートを写すテンプレートのxlsxパス
+        :param shared_formula: Trueの場合はmake_shared_formulaで共有数式を作る
+        """
+        self.__template = px.load_workbook(template_path)
+        self.__book = px.Workbook(write_only=True)
+        self.__sheet = None
+        self.__path = None
+        self.__shared_formula = shared_formula
+        self.__shared_formula_count = 0
+
+        # 書式のテーブルを共有するので、テンプレートのセルの書式はそのまま使える
+        # (IndexedListはcopyすると中身が失われるのでオブジェクトごと共有する)
+        for attr in STYLE_ATTRIBUTES:
+            setattr(self.__book, attr, getattr(self.__template, attr))
+        self.__book.loaded_theme = self.__template.loaded_theme
+        self.__book.calculation = copy(self.__template.calculation)
+        self.__book.views = copy(self.__template.views)
+        self.__book.properties = copy(self.__template.properties)
+        self.__book.active = self.__template.index(self.__template.active)
+
+    @property
+    def active_sheet(self) -> WriteOnlyWorksheet:
+        return self.__sheet
+
+    @property
+    def template_sheet_names(self):
+        return self.__template.sheetnames
+
+    def get_template_sheet(self, sheet_name) -> Worksheet:
+        return self.__template[sheet_name]
+
+    def create_sheet(self, sheet_name, template_sheet_name=None) -> WriteOnlyWorksheet:
+        """シートを追加して書き込み先にする
+        template_sheet_nameを指定した場合はcopy_worksheetと同じく
+        列幅などの設定を写す(セルは写さない)
+        """
+        sheet_name = child.INVALID_TITLE_REGEX.sub("", sheet_name)
+        sheet_name = sheet_name[:31]
+        self.__sheet = self.__book.create_sheet(sheet_name)
+        self.__shared_formula_count = 0
+        if template_sheet_name is not None:
+            source = self.__template[template_sheet_name]
+            for attr in ("row_dimensions", "column_dimensions"):
+                target = getattr(self.__sheet, attr)
+                for key, dim in getattr(source, attr).items():
+                    target[key] = copy(dim)
+                    target[key].worksheet = self.__sheet
+            for attr in (
+                "sheet_format",
+                "sheet_properties",
+                "merged_cells",
+                "page_margins",
+                "page_setup",
+                "print_options",
+            ):
+                setattr(self.__sheet, attr, copy(getattr(source, attr)))
+        return self.__sheet
+
+    def copy_sheet(self, sheet_name) -> WriteOnlyWorksheet:
+        """テンプレートのシートをセルと表示設定も含めてそのまま写す"""
+        self.create_sheet(sheet_name, sheet_name)
+        source = self.__template[sheet_name]
+        for attr in (
+            "views",
+            "auto_filter",
+            "conditional_formatting",
+            "data_validations",
+            "protection",
+        ):
+            setattr(self.__sheet, attr, copy(getattr(source, attr)))
+        self.append(self.iter_template_rows(sheet_name))
+        return self.__sheet
+
+    def iter_template_rows(self, sheet_name, min_row=1, max_row=None):
+        """テンプレートのシートの行を書き込み用のセルのリストにして返す"""
+        source = self.__template[sheet_name]
+        max_row = max_row or source.max_row
+        cells = dict()
+        for (row, col), source_cell in source._cells.items():
+            if min_row <= row <= max_row:
+                cells.setdefault(row, dict())[col] = source_cell
+        for row in range(min_row, max_row + 1):
+            row_cells = cells.get(row, dict())
+            values = [None] * max(row_cells.keys(), default=0)
+            for col, source_cell in row_cells.items():
+                values[col - 1] = self.copy_cell(source_cell)
+            yield values
+
+    def copy_cell(self, source_cell) -> WriteOnlyCell:
+        """テンプレートのセルを値の種類と書式も含めて写す"""
+        cell = WriteOnlyCell(self.__sheet)
+        cell._value = source_cell._value
+        cell.data_type = source_cell.data_type
+        if source_cell.has_style:
+            cell._style = copy(source_cell._style)
+        if source_cell.hyperlink:
+            cell._hyperlink = copy(source_cell.hyperlink)
+        if source_cell.comment:
+            cell.comment = copy(source_cell.comment)
+        return cell
+
+    def make_style(self, number_format: str) -> StyleArray:
+        """表示形式だけを設定した書式、make_cellに渡して使い回す"""
+        cell = WriteOnlyCell(self.__sheet)
+        cell.number_format = number_format
+        return cell._style
+
+    def make_cell(self, value=None, style: StyleArray = None) -> WriteOnlyCell:
+        cell = WriteOnlyCell(self.__sheet, value)
+        if style is not None:
+            cell._style = copy(style)
+        return cell
+
+    @property
+    def shared_formula(self) -> bool:
+        return self.__shared_formula
+
+    def make_shared_formula(
+        self, col: int, min_row: int, max_row: int, text: str, last_text: str = None
+    ):
+        """
+        col列のmin_row行からmax_row行までで共有する数式を作る
+        :param text: min_row行の数式
+        :param last_text: max_row行の数式、指定した場合はtextをずらした数式と同じか確かめる
+        :return: (min_row行の値, 残りの行の値)、共有できない場合はNone
+        """
+        if not self.__shared_formula or min_row >= max_row:
+            return None
+        column = get_column_letter(col)
+        if last_text is not None:
+            try:
+                translated = Translator(text, f"{column}{min_row}").translate_formula(
+                    f"{column}{max_row}"
+                )
+                if not is_same_formula(translated, last_text):
+                    return None
+            except TokenizerError:
+                return None
+        si = self.__shared_formula_count
+        self.__shared_formula_count += 1
+        ref = f"{column}{min_row}:{column}{max_row}"
+        return SharedFormula(si, ref, text), SharedFormula(si)
+
+    def append(self, rows):
+        """行データを書き出す、セルはmake_cell/copy_cellで作ったものも使える"""
+        for row in rows:
+            self.__sheet.append(row)
+
+    def save_as(self, path):
+        """
+        名前を付けて保存
+        :param path: 保存先パス
+        """
+        self.__path = path
+        self.__book.save(path)
+        self.__template.close()
+
+    @property
+    def file_path(self):
+        """ファイルパス"""
+        return self.__path